@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+多篇文章批量生成配图（可断点续跑）
+
+每个 (文章, 章节) 是一个任务，状态持久化到任务日志（JSON Lines，只追加）：
+- queued：等待执行（含等待退避重试的任务）
+- in_flight：执行中；中断后再次运行时自动恢复为queued
+- done：已生成并插入markdown
+- failed：重试次数用尽（或找不到章节标题等无法重试的错误），记录最后一次错误
+
+特性：
+- 全局并发上限，跨文章共享
+- 任务级指数退避重试（在单次调用的max_retries之外）
+- Ctrl-C或崩溃后重新运行同一命令，从中断处继续
+"""
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+
+from generate_illustrations_v2 import (
+    ImageGenerator,
+    generate_section_image,
+    is_section_ready,
+)
+from image_store import store_file
+from markdown_doc import MarkdownDocument
+
+
+QUEUED = "queued"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+
+class PermanentJobError(Exception):
+    """重试也不会成功的错误（如文章中找不到章节标题），任务直接标记为failed"""
+
+
+class JobJournal:
+    """
+    任务日志：内存中维护，磁盘上是只追加的JSON Lines
+
+    每行是 {"key": ..., 字段...}，加载时按顺序合并。
+    状态变化只追加一行（只含变化的字段），不重写整个文件；
+    save() 在每次运行开始时把日志压缩为每个任务一行
+    """
+
+    def __init__(self, journal_path):
+        self.path = Path(journal_path)
+        self.lock = threading.Lock()
+        self.jobs = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 崩溃时写了一半的最后一行
+                        continue
+                    key = record.pop("key")
+                    self.jobs.setdefault(key, {}).update(record)
+
+        # 上次中断时正在执行的任务，重新排队
+        for job in self.jobs.values():
+            if job["status"] == IN_FLIGHT:
+                job["status"] = QUEUED
+
+    def save(self):
+        """压缩：原子地重写为每个任务一行"""
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for key, job in self.jobs.items():
+                f.write(json.dumps(dict(job, key=key), ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def update(self, key, **fields):
+        fields["updated_at"] = time.time()
+        with self.lock:
+            self.jobs[key].update(fields)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(dict(fields, key=key), ensure_ascii=False) + '\n')
+
+    def counts(self):
+        result = {QUEUED: 0, IN_FLIGHT: 0, DONE: 0, FAILED: 0}
+        for job in self.jobs.values():
+            result[job["status"]] += 1
+        return result
+
+
+def enqueue_articles(journal, markdown_paths, config_name="visual_config.json",
+                     output_dir="images/illustrations", retry_failed=False):
+    """
+    读取每篇文章的配置，把尚未登记的章节加入任务日志
+
+    已登记的任务改用当前配置中的章节内容（修正了标题等配置后无需删日志）；
+    状态保持不变，只有done任务的配图描述改了时才重新排队生成
+    """
+    added = 0
+    for markdown_path in markdown_paths:
+        markdown_path = Path(markdown_path).resolve()
+        config_path = markdown_path.parent / config_name
+        if not config_path.exists():
+            print(f"⚠️  跳过（无配置文件）: {config_path}")
+            continue
+
+        with open(config_path, 'r', encoding='utf-8') as f:
+            sections = json.load(f)['sections']
+
+        for idx, section in enumerate(sections, 1):
+            if not is_section_ready(section):
+                continue
+
+            key = f"{markdown_path}#{idx}"
+            job = journal.jobs.get(key)
+            if job is None:
+                image_filename = f"illustration_{idx}.png"
+                journal.jobs[key] = {
+                    "article": str(markdown_path),
+                    "index": idx,
+                    "section": section,
+                    "image_path": str(markdown_path.parent / output_dir / image_filename),
+                    "image_rel_path": f"{output_dir}/{image_filename}",
+                    "status": QUEUED,
+                    "attempts": 0,
+                    "error": None,
+                    "next_attempt_at": 0,
+                    "updated_at": time.time(),
+                }
+                added += 1
+            else:
+                description_changed = (job["section"].get("visual_description")
+                                       != section.get("visual_description"))
+                job["section"] = section
+                if job["status"] == DONE and description_changed:
+                    # 已生成的图片与新描述不符，覆盖重新生成
+                    job.update(status=QUEUED, attempts=0, error=None, next_attempt_at=0,
+                               regenerate=True)
+                    print(f"🔄 配图描述已修改，重新生成: {markdown_path.name} #{idx}")
+                elif job["status"] == FAILED and retry_failed:
+                    job.update(status=QUEUED, attempts=0, error=None, next_attempt_at=0)
+
+    journal.save()
+    return added
+
+
+class BatchRunner:
+    """按全局并发上限执行任务日志中的所有任务"""
+
+    def __init__(self, journal, provider='auto', concurrency=4, max_attempts=4,
+                 base_delay=30, max_delay=600, skip_existing=True, store_dir=None):
+        self.journal = journal
+        self.provider = provider
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.skip_existing = skip_existing
+        self.store_dir = store_dir
+
+        self._local = threading.local()
+        self._docs = {}            # 文章路径 -> MarkdownDocument（插入时复用）
+        self._article_locks = {}   # 文章路径 -> Lock（同一文章的插入串行）
+        self._docs_lock = threading.Lock()
+
+    def _generator(self):
+        """每个工作线程一个生成器实例"""
+        if not hasattr(self._local, "generator"):
+            self._local.generator = ImageGenerator(provider=self.provider)
+        return self._local.generator
+
+    def _insert(self, job):
+        article = job["article"]
+        with self._docs_lock:
+            lock = self._article_locks.setdefault(article, threading.Lock())
+        with lock:
+            doc = self._docs.get(article)
+            if doc is None:
+                doc = self._docs[article] = MarkdownDocument.load(article)
+            h2_title = job["section"]["h2_title"]
+            result = doc.insert_image_after_heading(h2_title, job["image_rel_path"])
+            if result == 'missing':
+                raise PermanentJobError(f"未找到H2标题: {h2_title}")
+            if result == 'inserted':
+                doc.save()
+
+    def _run_job(self, key):
+        """在工作线程中执行单个任务，返回 (key, error, retryable)"""
+        job = self.journal.jobs[key]
+        image_path = Path(job["image_path"])
+        try:
+            if job.get("regenerate") or not (self.skip_existing and image_path.exists()):
+                image_path.parent.mkdir(parents=True, exist_ok=True)
+                generate_section_image(self._generator(), job["section"], image_path)
+                if self.store_dir:
+                    store_file(image_path, self.store_dir)
+            self._insert(job)
+            return key, None, False
+        except PermanentJobError as e:
+            return key, str(e), False
+        except Exception as e:
+            return key, str(e), True
+
+    def _backoff(self, attempts):
+        return min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+
+    def _finish(self, key, error, retryable=True):
+        job = self.journal.jobs[key]
+        label = f"{Path(job['article']).name} #{job['index']}「{job['section']['h2_title']}」"
+        if error is None:
+            self.journal.update(key, status=DONE, error=None, regenerate=False)
+            print(f"   ✅ {label}")
+        elif not retryable:
+            self.journal.update(key, status=FAILED, error=error)
+            print(f"   ❌ {label} {error}")
+        elif job["attempts"] >= self.max_attempts:
+            self.journal.update(key, status=FAILED, error=error)
+            print(f"   ❌ {label} 重试{job['attempts']}次仍失败: {error}")
+        else:
+            delay = self._backoff(job["attempts"])
+            self.journal.update(key, status=QUEUED, error=error,
+                                next_attempt_at=time.time() + delay)
+            print(f"   ⚠️  {label} 失败，{delay:.0f}秒后重试: {error}")
+
+    def run(self):
+        pending = {}  # future -> key
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            while True:
+                now = time.time()
+                ready = [
+                    key for key, job in self.journal.jobs.items()
+                    if job["status"] == QUEUED and job["next_attempt_at"] <= now
+                ]
+                for key in ready[:self.concurrency - len(pending)]:
+                    job = self.journal.jobs[key]
+                    self.journal.update(key, status=IN_FLIGHT, attempts=job["attempts"] + 1)
+                    pending[executor.submit(self._run_job, key)] = key
+
+                if not pending:
+                    waiting = [job["next_attempt_at"] for job in self.journal.jobs.values()
+                               if job["status"] == QUEUED]
+                    if not waiting:
+                        break
+                    # 所有任务都在退避中，睡到最早的那个
+                    time.sleep(max(0, min(waiting) - time.time()))
+                    continue
+
+                done, _ = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del pending[future]
+                    self._finish(*future.result())
+        except KeyboardInterrupt:
+            # 正在进行的API调用（含其内部重试）无法中断，解释器退出时也会等待工作线程。
+            # 不再启动新任务，等它们结束并记录结果，图片和markdown不会写到一半。
+            # 未记录结果的in_flight任务下次运行时重新排队
+            if pending:
+                print(f"\n⏳ 等待 {len(pending)} 个进行中的任务结束（不再启动新任务）...")
+            executor.shutdown(wait=True, cancel_futures=True)
+            for future in pending:
+                if not future.cancelled():
+                    self._finish(*future.result())
+            raise
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def find_articles(papers_dir):
+    """papers/下所有带visual_config.json的解读文章"""
+    return sorted(
+        path for path in Path(papers_dir).glob("*/*_解读.md")
+        if (path.parent / "visual_config.json").exists()
+    )
+
+
+def main():
+    """命令行入口"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='多篇文章批量生成纽约客风格配图（可断点续跑）',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例用法：
+
+  1. 为papers/下所有已填写配置的文章生成配图：
+     python batch_illustrations.py --papers papers
+
+  2. 指定文章，全局最多2个并发请求：
+     python batch_illustrations.py a.md b.md --concurrency 2
+
+  3. 中断后继续（同一个任务日志）：
+     python batch_illustrations.py --papers papers
+
+  4. 重新尝试之前失败的任务：
+     python batch_illustrations.py --papers papers --retry-failed
+
+  5. 风格调整后整体重新生成（新任务日志，中断后用同一命令继续）：
+     python batch_illustrations.py --papers papers --journal restyle.jsonl --no-skip
+        """
+    )
+    parser.add_argument('markdown', nargs='*', help='Markdown文件路径')
+    parser.add_argument('--papers', metavar='DIR', help='扫描论文库中的所有解读文章')
+    parser.add_argument('--journal', default='illustration_jobs.jsonl',
+                        help='任务日志路径（默认: illustration_jobs.jsonl）')
+    parser.add_argument('--config', default='visual_config.json',
+                        help='配置文件名（默认: visual_config.json）')
+    parser.add_argument('--output-dir', default='images/illustrations',
+                        help='图片输出目录（默认: images/illustrations）')
+    parser.add_argument('--provider', choices=['jimeng', 'gemini', 'auto'],
+                        default='auto', help='图片生成API（默认: auto）')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='全局并发上限（默认: 4）')
+    parser.add_argument('--max-attempts', type=int, default=4,
+                        help='每个任务最多尝试次数（默认: 4）')
+    parser.add_argument('--base-delay', type=float, default=30,
+                        help='首次重试等待秒数，之后指数翻倍（默认: 30）')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help='把已失败的任务重新排队')
+    parser.add_argument('--no-skip', action='store_true',
+                        help='重新生成已存在的图片')
+    parser.add_argument('--store', metavar='DIR', default=None,
+                        help='共享图片存储目录（如 papers/.store），生成的图片按内容去重')
+
+    args = parser.parse_args()
+
+    markdown_paths = list(args.markdown)
+    if args.papers:
+        markdown_paths.extend(find_articles(args.papers))
+
+    journal = JobJournal(args.journal)
+    added = enqueue_articles(journal, markdown_paths, args.config, args.output_dir,
+                             retry_failed=args.retry_failed)
+
+    counts = journal.counts()
+    print(f"📋 任务日志: {args.journal}（新增 {added} 个任务）")
+    print(f"   待执行 {counts[QUEUED]} / 已完成 {counts[DONE]} / 已失败 {counts[FAILED]}\n")
+
+    runner = BatchRunner(
+        journal,
+        provider=args.provider,
+        concurrency=args.concurrency,
+        max_attempts=args.max_attempts,
+        base_delay=args.base_delay,
+        skip_existing=not args.no_skip,
+        store_dir=args.store,
+    )
+    try:
+        runner.run()
+    except KeyboardInterrupt:
+        print("\n⏸️  已中断，重新运行同一命令即可继续")
+        sys.exit(130)
+
+    counts = journal.counts()
+    print("\n" + "="*60)
+    print(f"✨ 完成！已完成 {counts[DONE]} 个，失败 {counts[FAILED]} 个")
+    if counts[FAILED]:
+        print(f"💡 查看 {args.journal} 中的error字段，修正后使用 --retry-failed 重试")
+
+
+if __name__ == '__main__':
+    main()
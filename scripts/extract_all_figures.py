@@ -2,14 +2,219 @@
 """
 自动从PDF中提取所有Figure和Table
 不依赖markdown标注，直接扫描整个PDF
+
+图注定位来自全文交叉引用索引（figure_index.py），
+正文中的 "as shown in Figure 3." 不会被当成图注
 """
 import fitz  # PyMuPDF
-import re
+import math
+import struct
+import zlib
 from pathlib import Path
 import sys
 
+from image_store import release_path, store_file
+from figure_index import build_figure_index, crop_band, save_figure_index, select_render_targets
+from ocr_pages import ocr_missing_text
+
+
+# 默认2x分辨率
+DEFAULT_ZOOM = 2.0
+# 超出内存预算时，缩放最低降到1x，再不够就分条带渲染
+MIN_ZOOM = 1.0
+
+
+def estimate_pixmap_bytes(clip_rect, zoom, channels):
+    """估算pixmap占用内存：宽 × 高 × 通道数"""
+    width = math.ceil(clip_rect.width * zoom)
+    height = math.ceil(clip_rect.height * zoom)
+    return width * height * channels
+
+
+def is_grayscale_region(page, clip_rect):
+    """
+    用低分辨率缩略图判断区域是否只有灰度内容（黑白线图、纯文字表格）
+
+    灰度pixmap只有1个通道，内存和PNG体积都是RGB的1/3
+    """
+    thumb = page.get_pixmap(clip=clip_rect, matrix=fitz.Matrix(0.25, 0.25), alpha=False)
+    samples = thumb.samples
+    return samples[0::3] == samples[1::3] == samples[2::3]
+
+
+def _png_chunk(f, tag, data):
+    f.write(struct.pack('>I', len(data)))
+    f.write(tag)
+    f.write(data)
+    f.write(struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+
+def _save_png_in_bands(page, clip_rect, zoom, colorspace, output_path, max_band_bytes):
+    """
+    按水平条带逐段渲染，边渲染边写入PNG，内存峰值只有一个条带
+
+    条带边界按整像素行计算；PyMuPDF对clip取整可能多出一行，
+    用pixmap的原点坐标对齐后只取需要的行
+    """
+    matrix = fitz.Matrix(zoom, zoom)
+    full = (clip_rect * matrix).irect
+    channels = colorspace.n
+    row_bytes = full.width * channels
+    # 条带pixmap、samples拷贝、加上过滤字节后的拼接各占一份
+    band_rows = max(1, max_band_bytes // (3 * row_bytes))
+    # 页面只解析一次，各条带复用
+    display_list = page.get_displaylist()
+
+    with open(output_path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        color_type = 0 if channels == 1 else 2
+        _png_chunk(f, b'IHDR', struct.pack('>IIBBBBB', full.width, full.height, 8, color_type, 0, 0, 0))
+
+        compressor = zlib.compressobj()
+        for r0 in range(full.y0, full.y1, band_rows):
+            r1 = min(full.y1, r0 + band_rows)
+            band = fitz.Rect(full.x0 / zoom, r0 / zoom, full.x1 / zoom, r1 / zoom)
+            pix = display_list.get_pixmap(matrix=matrix, colorspace=colorspace, alpha=False, clip=band)
+
+            samples = pix.samples
+            col_start = (full.x0 - pix.x) * channels
+            rows = []
+            for r in range(r0, r1):
+                offset = (r - pix.y) * pix.stride + col_start
+                if 0 <= r - pix.y < pix.height:
+                    rows.append(b'\x00' + samples[offset:offset + row_bytes])
+                else:
+                    # 取整误差导致缺行时补白
+                    rows.append(b'\x00' + b'\xff' * row_bytes)
+            data = compressor.compress(b''.join(rows))
+            if data:
+                _png_chunk(f, b'IDAT', data)
+            del pix, samples, rows
+
+        _png_chunk(f, b'IDAT', compressor.flush())
+        _png_chunk(f, b'IEND', b'')
+
+    return math.ceil((full.y1 - full.y0) / band_rows)
+
+
+def render_clip(page, clip_rect, output_path, zoom=DEFAULT_ZOOM, max_pixmap_bytes=None):
+    """
+    把页面区域渲染为PNG，遵守内存预算
+
+    策略：
+    1. 灰度内容使用单通道、所有输出都不带alpha
+    2. 超出预算时降低缩放（不低于1x）
+    3. 仍超出则分条带渲染并流式写入PNG
+
+    Returns:
+        {'zoom': 实际缩放, 'colorspace': 'gray'/'rgb', 'bands': 条带数（1表示整块渲染）}
+    """
+    colorspace = fitz.csGRAY if is_grayscale_region(page, clip_rect) else fitz.csRGB
+
+    needed = estimate_pixmap_bytes(clip_rect, zoom, colorspace.n)
+    if max_pixmap_bytes and needed > max_pixmap_bytes:
+        # 留1%余量抵消宽高向上取整
+        zoom = max(MIN_ZOOM, zoom * math.sqrt(max_pixmap_bytes / needed) * 0.99)
+        needed = estimate_pixmap_bytes(clip_rect, zoom, colorspace.n)
+
+    info = {'zoom': round(zoom, 2), 'colorspace': 'gray' if colorspace.n == 1 else 'rgb', 'bands': 1}
+
+    if max_pixmap_bytes and needed > max_pixmap_bytes:
+        info['bands'] = _save_png_in_bands(page, clip_rect, zoom, colorspace,
+                                           output_path, max_pixmap_bytes)
+    else:
+        pix = page.get_pixmap(clip=clip_rect, matrix=fitz.Matrix(zoom, zoom),
+                              colorspace=colorspace, alpha=False)
+        pix.save(str(output_path))
 
-def extract_all_figures(pdf_path, output_dir="images", prefix=""):
+    return info
+
+
+def region_has_raster_images(page, clip_rect):
+    """区域内是否有位图（照片、截图等）；纯矢量图/表格返回False"""
+    for info in page.get_image_info():
+        if fitz.Rect(info['bbox']).intersects(clip_rect):
+            return True
+    return False
+
+
+def choose_output_format(page, clip_rect, output_format, vector_format='svg'):
+    """
+    确定输出格式
+
+    output_format为'auto'时：区域含位图 → png，否则 → vector_format（svg/pdf）
+    """
+    if output_format != 'auto':
+        return output_format
+    return 'png' if region_has_raster_images(page, clip_rect) else vector_format
+
+
+def _strip_outside_clip(page, clip_rect):
+    """
+    删除页面上截图区域以外的文字、位图和矢量图形（在页面副本上调用）
+
+    show_pdf_page的clip只是遮住区域外的内容，整页仍会被嵌入；
+    不先删除的话，区域外的照片会原样进入导出文件
+    """
+    # 区域内有位图时只涂白区域外的像素，否则整张删除
+    if region_has_raster_images(page, clip_rect):
+        images = fitz.PDF_REDACT_IMAGE_PIXELS
+    else:
+        images = fitz.PDF_REDACT_IMAGE_REMOVE
+
+    r = page.rect
+    outside = [
+        fitz.Rect(r.x0, r.y0, r.x1, clip_rect.y0),                  # 上
+        fitz.Rect(r.x0, clip_rect.y1, r.x1, r.y1),                  # 下
+        fitz.Rect(r.x0, clip_rect.y0, clip_rect.x0, clip_rect.y1),  # 左
+        fitz.Rect(clip_rect.x1, clip_rect.y0, r.x1, clip_rect.y1),  # 右
+    ]
+    for rect in outside:
+        if not rect.is_empty:
+            page.add_redact_annot(rect, fill=False)
+    page.apply_redactions(images=images, graphics=fitz.PDF_REDACT_LINE_ART_REMOVE_IF_COVERED)
+
+
+def export_vector_clip(page, clip_rect, output_path, output_format):
+    """
+    把页面区域导出为独立的单页PDF或SVG，保留矢量信息，不做栅格化
+
+    先在原页面的副本上删除区域外的内容，再通过show_pdf_page把裁剪区域
+    放到新文档的单页上，SVG从这个单页生成，因此只包含截图区域。
+    SVG中文字保留为<text>，不转成路径（文字表格转路径后比PNG还大）
+    """
+    source = fitz.open()
+    source.insert_pdf(page.parent, from_page=page.number, to_page=page.number)
+    _strip_outside_clip(source[0], clip_rect)
+
+    snippet = fitz.open()
+    target = snippet.new_page(width=clip_rect.width, height=clip_rect.height)
+    target.show_pdf_page(target.rect, source, 0, clip=clip_rect)
+
+    if output_format == 'pdf':
+        snippet.save(str(output_path), garbage=4, deflate=True)
+    else:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(target.get_svg_image(text_as_path=False))
+
+    snippet.close()
+    source.close()
+
+
+def peak_rss_mb():
+    """进程峰值内存（MB），平台不支持时返回None"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def extract_all_figures(pdf_path, output_dir="images", prefix="", max_pixmap_mb=None,
+                        output_format='png', vector_format='svg',
+                        ocr=False, ocr_language='eng', store_dir=None):
     """
     自动扫描PDF中的所有Figure和Table，批量截图保存
 
@@ -17,10 +222,20 @@ def extract_all_figures(pdf_path, output_dir="images", prefix=""):
         pdf_path: PDF文件路径
         output_dir: 输出目录
         prefix: 文件名前缀（如"ResNet_2015"）
+        max_pixmap_mb: 单张截图的内存预算（MB），超出时自动降低缩放或分条带渲染；
+                       None表示不限制
+        output_format: 'png' / 'svg' / 'pdf' / 'auto'
+                       auto：区域含位图时截图为png，纯矢量内容导出为vector_format
+        vector_format: auto模式下矢量内容的格式（'svg' 或 'pdf'）
+        ocr: 对没有文本层的页面（扫描版）做OCR后再识别图注
+        ocr_language: Tesseract语言
+        store_dir: 共享图片存储目录（如 papers/.store）；设置后截图存入存储，
+                   images/下保留指向存储的链接
 
     Returns:
         提取成功的图表列表
     """
+    max_pixmap_bytes = int(max_pixmap_mb * 1024 * 1024) if max_pixmap_mb else None
     pdf_path = Path(pdf_path)
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -35,105 +250,102 @@ def extract_all_figures(pdf_path, output_dir="images", prefix=""):
     print(f"📄 总页数: {len(doc)}")
     print(f"📁 输出目录: {output_dir}\n")
 
-    extracted = []
-
-    # 扫描每一页
-    for page_num, page in enumerate(doc, 1):
-        text = page.get_text()
-
-        # 查找Figure和Table标记（支持多种格式）
-        # 匹配: "Figure 4:", "Fig. 4.", "Table 7:"等
-        patterns = [
-            r'(Figure)\s+(\d+)\s*[:\.]',
-            r'(Fig\.)\s+(\d+)\s*[:\.]',
-            r'(Table)\s+(\d+)\s*[:\.]',
-        ]
-
-        found_items = []
-        for pattern in patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                item_type = match.group(1).lower()
-                item_num = match.group(2)
-                position = match.span()[0]
-
-                # 规范化类型
-                if item_type.startswith('fig'):
-                    item_type = 'figure'
-
-                found_items.append((item_type, item_num, position, match))
-
-        if not found_items:
-            continue
-
-        # 去重（同一个图表可能有多个引用）
-        seen = {}
-        for item_type, item_num, position, match in found_items:
-            key = (item_type, item_num)
-            if key not in seen or position < seen[key][0]:
-                seen[key] = (position, match)
-
-        # 对每个图表截图
-        for (item_type, item_num), (position, match) in seen.items():
-            print(f"[第{page_num}页] 发现 {item_type.capitalize()} {item_num}...")
-
-            # 查找标题位置
-            text_instances = page.search_for(match.group(0))
-
-            if not text_instances:
-                print(f"  ⚠️  找不到标题位置，跳过")
-                continue
-
-            # 使用第一个匹配位置
-            inst = text_instances[0]
-
-            # 计算截图区域
-            page_width = page.rect.width
-            page_height = page.rect.height
-
-            x0 = page_width * 0.08  # 左边距8%
-            x1 = page_width * 0.92  # 右边距8%
-
-            if item_type == 'figure':
-                # Figure: 标题通常在图片下方
-                # 向上找图片（400-600pt），向下包含标题
-                y0 = max(0, inst.y0 - 500)
-                y1 = min(page_height, inst.y1 + 30)
-            else:  # table
-                # Table: 标题位置不固定，默认向上多截、向下少截
-                y0 = max(0, inst.y0 - 700)
-                y1 = min(page_height, inst.y1 + 200)
-
-            # 截图
-            clip_rect = fitz.Rect(x0, y0, x1, y1)
-            pix = page.get_pixmap(clip=clip_rect, matrix=fitz.Matrix(2, 2))  # 2x分辨率
-
-            # 生成文件名
-            if prefix:
-                filename = f"{prefix}_{item_type}{item_num}.png"
-            else:
-                filename = f"{item_type}{item_num}.png"
-
-            output_path = output_dir / filename
+    # 扫描页OCR（带缓存，只处理没有文本层的页面）
+    ocr_results = ocr_missing_text(pdf_path, language=ocr_language) if ocr else None
 
-            # 保存
-            pix.save(str(output_path))
+    # 一次扫描全文，区分图注和正文引用
+    index = build_figure_index(doc, ocr_results)
+    save_figure_index(index, output_dir / "figure_index.json")
 
-            print(f"  ✅ 已保存: {filename}")
+    # 全文去重：每个图表一个区域，续表每页一个区域
+    targets = select_render_targets(index)
 
-            extracted.append({
-                'type': item_type,
-                'number': item_num,
-                'page': page_num,
-                'filename': filename,
-                'path': str(output_path)
-            })
+    extracted = []
+    rendered_regions = {}  # (页码, 截图区域) -> 已保存的文件名
+
+    for target in targets:
+        page_num = target['page']
+        page = doc[page_num - 1]
+        item_type = target['type']
+        item_num = target['number'] + target['sub']
+        entry = index[target['key']]
+
+        label = f"{item_type.capitalize()} {item_num}"
+        if target['part']:
+            label += f"（续{target['part']}）"
+        print(f"[第{page_num}页] 发现 {label}...")
+
+        # 截图区域（与索引中判断附近是否有图形的区域一致）
+        clip_rect = fitz.Rect(crop_band(item_type, target['bbox'], page.rect.width,
+                                        page.rect.height, continued=bool(target['part'])))
+
+        region_key = (page_num, tuple(round(v) for v in clip_rect))
+        if region_key in rendered_regions:
+            fmt = rendered_regions[region_key]['format']
+        else:
+            fmt = choose_output_format(page, clip_rect, output_format, vector_format)
+
+        # 生成文件名
+        stem = f"{item_type}{item_num}"
+        if target['part']:
+            stem += f"_cont{target['part']}"
+        filename = f"{prefix}_{stem}.{fmt}" if prefix else f"{stem}.{fmt}"
+
+        output_path = output_dir / filename
+
+        if region_key in rendered_regions:
+            # 子图与整图截到同一区域时，只渲染一次
+            filename = rendered_regions[region_key]['filename']
+            output_path = output_dir / filename
+            render_info = rendered_regions[region_key]
+            print(f"  ♻️  与已保存区域相同: {filename}")
+        elif fmt != 'png':
+            # 矢量导出，跳过栅格化
+            release_path(output_path)
+            export_vector_clip(page, clip_rect, output_path, fmt)
+            render_info = {'zoom': None, 'colorspace': None, 'bands': 0, 'format': fmt}
+            rendered_regions[region_key] = dict(render_info, filename=filename)
+            print(f"  ✅ 已保存: {filename}（矢量）")
+        else:
+            # 截图并保存（2x分辨率，受内存预算约束）
+            release_path(output_path)
+            render_info = render_clip(page, clip_rect, output_path,
+                                      max_pixmap_bytes=max_pixmap_bytes)
+            render_info['format'] = 'png'
+            rendered_regions[region_key] = dict(render_info, filename=filename)
+
+            if render_info['bands'] > 1:
+                print(f"  ✅ 已保存: {filename}（{render_info['zoom']}x，分{render_info['bands']}段渲染）")
+            elif render_info['zoom'] < DEFAULT_ZOOM:
+                print(f"  ✅ 已保存: {filename}（降至{render_info['zoom']}x）")
+            else:
+                print(f"  ✅ 已保存: {filename}")
+
+        if store_dir:
+            store_file(output_path, store_dir)
+
+        extracted.append({
+            'type': item_type,
+            'number': item_num,
+            'part': target['part'],
+            'page': page_num,
+            'filename': filename,
+            'path': str(output_path),
+            'format': render_info['format'],
+            'zoom': render_info['zoom'],
+            'colorspace': render_info['colorspace'],
+            'caption': target['caption'],
+            'mentions': entry['mentions']
+        })
 
     doc.close()
 
     print(f"\n{'='*60}")
     print(f"✨ 完成！成功提取 {len(extracted)} 个图表")
     print(f"📁 保存位置: {output_dir.absolute()}")
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"📈 峰值内存: {peak:.0f} MB")
 
     return extracted
 
@@ -152,7 +364,15 @@ def generate_markdown_references(extracted, output_file="figure_list.md"):
             filename = item['filename']
             page = item['page']
 
-            f.write(f"## {item_type} {item_num} (第{page}页)\n\n")
+            heading = f"{item_type} {item_num}"
+            if item.get('part'):
+                heading += f" 续{item['part']}"
+            f.write(f"## {heading} (第{page}页)\n\n")
+            if item.get('caption'):
+                f.write(f"> {item['caption']}\n\n")
+            if item.get('mentions'):
+                pages = '、'.join(str(p) for p in item['mentions'])
+                f.write(f"正文引用：第{pages}页\n\n")
             f.write(f"```markdown\n")
             f.write(f"![{item_type} {item_num}](images/{filename})\n")
             f.write(f"```\n\n")
@@ -161,22 +381,56 @@ def generate_markdown_references(extracted, output_file="figure_list.md"):
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("用法: python extract_all_figures.py <PDF文件> [输出目录] [前缀]")
-        print("\n示例:")
-        print("  python extract_all_figures.py paper.pdf")
-        print("  python extract_all_figures.py ResNet_2015.pdf images ResNet_2015")
-        sys.exit(1)
-
-    pdf_path = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else "images"
-    prefix = sys.argv[3] if len(sys.argv) > 3 else ""
-
-    extracted = extract_all_figures(pdf_path, output_dir, prefix)
+    import argparse
+
+    def positive_mb(value):
+        mb = float(value)
+        if not mb > 0:  # 也拒绝nan；0会被当成不限制，负数会让缩放计算出错
+            raise argparse.ArgumentTypeError(f"必须大于0: {value}")
+        return mb
+
+    parser = argparse.ArgumentParser(
+        description='自动提取PDF中的所有Figure和Table',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python extract_all_figures.py paper.pdf
+  python extract_all_figures.py ResNet_2015.pdf images ResNet_2015
+  python extract_all_figures.py poster.pdf images Poster_2024 --max-pixmap-mb 64
+  python extract_all_figures.py ResNet_2015.pdf images ResNet_2015 --format auto
+  python extract_all_figures.py Scan_1998.pdf images Scan_1998 --ocr
+        """
+    )
+    parser.add_argument('pdf', help='PDF文件')
+    parser.add_argument('output_dir', nargs='?', default='images', help='输出目录（默认: images）')
+    parser.add_argument('prefix', nargs='?', default='', help='文件名前缀')
+    parser.add_argument('--max-pixmap-mb', type=positive_mb, default=None,
+                        help='单张截图的内存预算（MB），大页面/海报并行提取时防止OOM')
+    parser.add_argument('--format', dest='output_format', default='png',
+                        choices=['png', 'svg', 'pdf', 'auto'],
+                        help='输出格式（默认: png）；auto：含位图用png，纯矢量图表导出矢量格式')
+    parser.add_argument('--vector-format', default='svg', choices=['svg', 'pdf'],
+                        help='auto模式下矢量图表的格式（默认: svg）')
+    parser.add_argument('--ocr', action='store_true',
+                        help='扫描版PDF：对没有文本层的页面OCR后再识别图注（需要Tesseract）')
+    parser.add_argument('--ocr-language', default=None,
+                        help='Tesseract语言（默认: eng，中文用 chi_sim+eng）；指定即启用--ocr')
+    parser.add_argument('--store', metavar='DIR', default=None,
+                        help='共享图片存储目录（如 ../.store），截图按内容去重')
+
+    args = parser.parse_args()
+
+    extracted = extract_all_figures(args.pdf, args.output_dir, args.prefix,
+                                    max_pixmap_mb=args.max_pixmap_mb,
+                                    output_format=args.output_format,
+                                    vector_format=args.vector_format,
+                                    ocr=args.ocr or args.ocr_language is not None,
+                                    ocr_language=args.ocr_language or 'eng',
+                                    store_dir=args.store)
 
     if extracted:
         # 生成引用列表
-        list_file = Path(output_dir) / "figure_list.md"
+        list_file = Path(args.output_dir) / "figure_list.md"
         generate_markdown_references(extracted, list_file)
 
 
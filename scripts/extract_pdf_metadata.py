@@ -8,11 +8,18 @@ import os
 from pathlib import Path
 from datetime import datetime
 
+from language_support import find_title_tokenizer
 
-def extract_title_from_pdf(pdf_path):
+
+def extract_title_from_pdf(pdf_path, ocr=False, ocr_language='eng'):
     """
     从PDF提取标题（优先从第一页文本，备选从metadata）
 
+    参数:
+        pdf_path: PDF文件路径
+        ocr: 第一页没有文本层（扫描版）时OCR后再提取
+        ocr_language: Tesseract语言
+
     返回: 完整标题字符串
     """
     try:
@@ -33,7 +40,13 @@ def extract_title_from_pdf(pdf_path):
     # 方法2：从第一页提取（通常标题是第一页最大字号的文本）
     if len(doc) > 0:
         first_page = doc[0]
-        blocks = first_page.get_text("dict")["blocks"]
+        page_dict = None
+        if ocr:
+            from ocr_pages import ocr_missing_text
+            ocr_results = ocr_missing_text(pdf_path, language=ocr_language, pages={1})
+            if 1 in ocr_results:
+                page_dict = ocr_results[1]['dict']
+        blocks = (page_dict or first_page.get_text("dict"))["blocks"]
 
         # 找到字号最大的文本块（通常是标题）
         max_size = 0
@@ -109,40 +122,18 @@ def simplify_title(title, max_length=30):
     """
     简化标题为短标识
 
-    策略：
-    1. 提取首字母缩写（如 BERT, GPT, T5）
-    2. 提取关键词（Transfer Learning, Attention）
-    3. 翻译为中文关键词
+    按标题语言选择分词器（见language_support.py）：
+    - 英文：首字母缩写（BERT, T5）→ 大写关键词 → 前几个单词
+    - 中文：英文缩写 → 去掉"基于""研究"等通用前后缀后的关键词
 
     参数:
         title: 完整标题
         max_length: 最大长度
 
-    返回: 简化后的标识（英文，适合做文件名）
+    返回: 简化后的标识（适合做文件名）
     """
-    # 常见缩写模式
-    acronyms = re.findall(r'\b[A-Z][A-Z0-9]+\b', title)
-    if acronyms:
-        # 使用第一个缩写
-        return acronyms[0]
-
-    # 提取关键词（大写开头的词）
-    keywords = re.findall(r'\b[A-Z][a-z]+\b', title)
-    if len(keywords) >= 2:
-        # 组合前2-3个关键词
-        combined = '_'.join(keywords[:3])
-        if len(combined) <= max_length:
-            return combined
-
-    # 如果没有合适的关键词，使用前N个单词
-    words = title.split()[:3]
-    simplified = '_'.join(w for w in words if len(w) > 3)
-
-    # 清理特殊字符
-    simplified = re.sub(r'[^\w\-]', '_', simplified)
-    simplified = re.sub(r'_+', '_', simplified)
-
-    return simplified[:max_length]
+    _, simplify = find_title_tokenizer(title)
+    return simplify(title, max_length)
 
 
 def generate_paper_id(title, year, user_hint=None):
@@ -196,7 +187,7 @@ def extract_authors_from_pdf(pdf_path):
     return []
 
 
-def create_metadata_json(pdf_path, url=None, user_hint=None):
+def create_metadata_json(pdf_path, url=None, user_hint=None, ocr=False, ocr_language='eng'):
     """
     创建完整的元数据JSON
 
@@ -204,11 +195,13 @@ def create_metadata_json(pdf_path, url=None, user_hint=None):
         pdf_path: PDF文件路径
         url: 原始URL（可选）
         user_hint: 用户提供的简短标识（可选）
+        ocr: 扫描版PDF时OCR第一页提取标题
+        ocr_language: Tesseract语言（中文论文用 chi_sim+eng）
 
     返回: (paper_id, metadata_dict)
     """
     # 提取信息
-    title = extract_title_from_pdf(pdf_path)
+    title = extract_title_from_pdf(pdf_path, ocr=ocr, ocr_language=ocr_language)
     year = extract_year_from_pdf(pdf_path, url)
     authors = extract_authors_from_pdf(pdf_path)
     paper_id = generate_paper_id(title or "Unknown", year, user_hint)
@@ -227,7 +220,8 @@ def create_metadata_json(pdf_path, url=None, user_hint=None):
     return paper_id, metadata
 
 
-def organize_paper_directory(pdf_path, output_base="papers", url=None, user_hint=None):
+def organize_paper_directory(pdf_path, output_base="papers", url=None, user_hint=None, ocr=False,
+                             ocr_language='eng'):
     """
     组织论文目录结构
 
@@ -236,11 +230,14 @@ def organize_paper_directory(pdf_path, output_base="papers", url=None, user_hint
         output_base: 输出基础目录
         url: 原始URL
         user_hint: 用户标识提示
+        ocr: 扫描版PDF时OCR第一页提取标题
+        ocr_language: Tesseract语言
 
     返回: (paper_dir, paper_id, metadata)
     """
     # 创建元数据
-    paper_id, metadata = create_metadata_json(pdf_path, url, user_hint)
+    paper_id, metadata = create_metadata_json(pdf_path, url, user_hint, ocr=ocr,
+                                              ocr_language=ocr_language)
 
     # 创建目录
     paper_dir = os.path.join(output_base, paper_id)
@@ -271,15 +268,32 @@ def main():
     """命令行工具"""
     import sys
 
-    if len(sys.argv) < 2:
-        print("用法: python extract_pdf_metadata.py <PDF文件> [URL] [用户标识]")
+    # --ocr：扫描版PDF，OCR第一页提取标题
+    # --ocr-language LANG：Tesseract语言（隐含--ocr）
+    ocr = False
+    ocr_language = 'eng'
+    argv = []
+    args = iter(sys.argv)
+    for arg in args:
+        if arg == '--ocr':
+            ocr = True
+        elif arg == '--ocr-language' or arg.startswith('--ocr-language='):
+            ocr = True
+            ocr_language = arg.split('=', 1)[1] if '=' in arg else next(args, ocr_language)
+        else:
+            argv.append(arg)
+
+    if len(argv) < 2:
+        print("用法: python extract_pdf_metadata.py <PDF文件> [URL] [用户标识] [--ocr] [--ocr-language chi_sim+eng]")
         print("示例: python extract_pdf_metadata.py paper.pdf https://arxiv.org/pdf/1910.10683 T5")
         print("      python extract_pdf_metadata.py bert.pdf \"\" BERT")
+        print("      python extract_pdf_metadata.py scan.pdf \"\" \"\" --ocr")
+        print("      python extract_pdf_metadata.py thesis.pdf \"\" \"\" --ocr-language chi_sim+eng")
         sys.exit(1)
 
-    pdf_path = sys.argv[1]
-    url = sys.argv[2] if len(sys.argv) > 2 and sys.argv[2] else None
-    user_hint = sys.argv[3] if len(sys.argv) > 3 else None
+    pdf_path = argv[1]
+    url = argv[2] if len(argv) > 2 and argv[2] else None
+    user_hint = argv[3] if len(argv) > 3 and argv[3] else None
 
     if not os.path.exists(pdf_path):
         print(f"错误：文件不存在: {pdf_path}")
@@ -290,7 +304,9 @@ def main():
         pdf_path,
         output_base="papers",
         url=url,
-        user_hint=user_hint
+        user_hint=user_hint,
+        ocr=ocr,
+        ocr_language=ocr_language
     )
 
     print(f"\n📁 目录结构：")
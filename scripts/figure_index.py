@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+全文图表交叉引用索引
+
+一次扫描整个PDF，区分两类出现：
+- 图注（caption）：行首的 "Figure 3:" / "Table 2." / "图 3：" 等，且带图注排版特征
+  （标签加粗或字体/字号与页面正文不同，或独立成块的一行短文本）
+- 正文引用（mention）：正文中的 "as shown in Figure 3"、"如图3所示" 等，
+  包括复数/缩写和编号列表（"Figures 3 and 4"、"Figs. 3–5"、"Fig 3"、"图3、4"），
+  复数/缩写形式不会被当成图注
+
+支持子图标签（Figure 3a / Figure 3(b)）和跨页续表（"Table 2 (continued)"、"续表 2"）。
+图注词表来自 language_support.py，所有语言合并为一个正则，每行只扫描一次。
+
+每个图表记录完整图注文本、图注位置，以及所有提到它的页码。
+结果保存为 figure_index.json，供图表截图和文章写作直接使用，无需再次扫描PDF。
+select_render_targets() 在全文范围内为每个图表选出唯一的截图区域。
+"""
+import json
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+from language_support import caption_locator, join_lines, label_numbers
+
+
+# PyMuPDF span flags 中的粗体位
+BOLD_FLAG = 16
+
+# 以这些字符结尾的行是完整句子，独立成块也不算图注排版
+SENTENCE_END = ('.', '。', '!', '！', '?', '？', ';', '；')
+
+# 图表目录（List of Figures / 插图目录）的条目："Figure 3: Model architecture ........ 3"
+TOC_LEADER = re.compile(r'(?:(?:[.·]\s?){3,}|…{2,})\s*\d+\s*$')
+
+# 编号后只有空格的中文图注（"图 3 网络结构示意图"）独立成块时的最大长度
+SHORT_CAPTION_CHARS = 50
+
+
+def figure_key(item_type, number, sub=''):
+    """索引键，如 "figure 3"、"figure 3b" """
+    return f"{item_type} {number}{sub}"
+
+
+def _label_parts(match):
+    """定位正则的匹配 → (类型, 编号, 子图标签)"""
+    item_type = 'figure' if match.group('figure') or match.group('figure_mention') else 'table'
+    sub = (match.group('sub1') or match.group('sub2') or '').lower()
+    return item_type, match.group('num'), sub
+
+
+def _is_bold(span):
+    # 黑体不算粗体：不少中文期刊正文就用黑体；图注用黑体、正文用宋体时由字体差异识别
+    font = span.get("font", "").lower()
+    return bool(span.get("flags", 0) & BOLD_FLAG) or 'bold' in font
+
+
+def _font_key(span):
+    return (span.get("font", ""), round(span.get("size", 0), 1))
+
+
+def _body_font(page_dict):
+    """页面正文字体：字符数最多的 (字体, 字号)"""
+    counts = Counter()
+    for block in page_dict["blocks"]:
+        for line in block.get("lines", []):
+            for span in line.get("spans", []):
+                counts[_font_key(span)] += len(span.get("text", "").strip())
+    return counts.most_common(1)[0][0] if counts else None
+
+
+def _is_emphasized(label_span, body_font):
+    """标签加粗，或字体/字号与正文不同"""
+    return _is_bold(label_span) or _font_key(label_span) != body_font
+
+
+def _is_styled(label_span, body_font, lines, text):
+    """
+    图注排版特征：标签加粗，或字体/字号与正文不同，
+    或是独立成块、不以句末标点结尾的一行（单独一行的短图注）
+
+    文本块的第一行本身不算：以 "图 3 展示了…" 开头的正文段落也是块首行
+    """
+    if _is_emphasized(label_span, body_font):
+        return True
+    return len(lines) == 1 and not text.endswith(SENTENCE_END)
+
+
+def crop_band(item_type, bbox, page_width, page_height, continued=False):
+    """
+    图注对应的截图区域 (x0, y0, x1, y1)
+
+    - 续表/续图：图注在页首，内容在下方
+    - Figure：标题通常在图片下方，向上找图片（400-600pt），向下包含标题
+    - Table：标题位置不固定，默认向上多截、向下少截
+    """
+    x0 = page_width * 0.08  # 左边距8%
+    x1 = page_width * 0.92  # 右边距8%
+    top, bottom = bbox[1], bbox[3]
+    if continued:
+        y0, y1 = top - 10, bottom + 700
+    elif item_type == 'figure':
+        y0, y1 = top - 500, bottom + 30
+    else:
+        y0, y1 = top - 700, bottom + 200
+    return (x0, max(0, y0), x1, min(page_height, y1))
+
+
+def _graphic_rects(page):
+    """页面上矢量图形和位图的位置"""
+    rects = [tuple(drawing['rect']) for drawing in page.get_drawings()]
+    rects += [tuple(info['bbox']) for info in page.get_image_info()]
+    return rects
+
+
+def _has_graphics(rects, band, caption_bbox):
+    """截图区域内（图注行之外）是否有图形或位图"""
+    x0, y0, x1, y1 = band
+    for rx0, ry0, rx1, ry1 in rects:
+        if rx1 < x0 or rx0 > x1 or ry1 < y0 or ry0 > y1:
+            continue
+        # 图注下划线之类贴着图注行的图形不算
+        if ry0 >= caption_bbox[1] - 2 and ry1 <= caption_bbox[3] + 2:
+            continue
+        return True
+    return False
+
+
+def _whitespace_sep_ok(label_span, body_font, lines, text):
+    """
+    编号后只有空格作分隔时（"图 3 网络结构示意图"），正文里同样常见（"图 3 展示了…"），
+    只在标签字体与正文不同、或整块只有一行短文本时才算图注
+    """
+    if _font_key(label_span) != body_font:
+        return True
+    return len(lines) == 1 and len(text) <= SHORT_CAPTION_CHARS
+
+
+def _iter_text_lines(page_dict):
+    """逐行返回 (block_lines, line_idx, line_text, spans, bbox)"""
+    for block in page_dict["blocks"]:
+        if block.get("type") != 0:
+            continue
+        lines = block.get("lines", [])
+        for line_idx, line in enumerate(lines):
+            spans = line.get("spans", [])
+            text = ''.join(span.get("text", "") for span in spans)
+            yield lines, line_idx, text, spans, line["bbox"]
+
+
+def _line_text(line):
+    return ''.join(span.get("text", "") for span in line.get("spans", [])).strip()
+
+
+def build_figure_index(doc, ocr_results=None):
+    """
+    扫描整个文档，建立图表索引
+
+    Args:
+        doc: 已打开的fitz.Document
+        ocr_results: ocr_pages.ocr_missing_text() 的结果，扫描页使用OCR文本
+
+    Returns:
+        {"figure 3": {
+            'type': 'figure', 'number': '3', 'sub': '',
+            'captions': [{'page', 'text', 'bbox', 'styled', 'emphasized',   # 按页码顺序
+                          'graphics', 'continued'}],
+            'mentions': [页码, ...],                                         # 正文引用所在页
+        }}
+        emphasized: 标签加粗或字体与正文不同；graphics: 截图区域内有图形或位图
+        图表目录条目（带点线引导符和页码）跳过
+        captions只保留有排版特征的图注；没有时才退回到仅满足"行首+分隔符"的候选
+        子图的正文引用同时计入所属的整图（"Figure 3(b)" 也是对 Figure 3 的引用）
+    """
+    entries = {}
+    weak_captions = {}
+
+    def entry_for(item_type, number, sub=''):
+        key = figure_key(item_type, number, sub)
+        if key not in entries:
+            entries[key] = {'type': item_type, 'number': number, 'sub': sub,
+                            'captions': [], 'mentions': []}
+        return entries[key]
+
+    ocr_results = ocr_results or {}
+    locator = caption_locator()
+
+    for page_num, page in enumerate(doc, 1):
+        ocr = ocr_results.get(page_num)
+        page_dict = ocr['dict'] if ocr else page.get_text("dict")
+        body_font = _body_font(page_dict)
+        graphic_rects = None  # 页面上有图注候选时才取
+        for lines, line_idx, text, spans, bbox in _iter_text_lines(page_dict):
+            stripped = text.strip()
+            # 图表目录条目既不是图注也不是正文引用
+            if TOC_LEADER.search(stripped):
+                continue
+
+            for match in locator.finditer(stripped):
+                item_type, number, sub = _label_parts(match)
+                continued = bool(match.group('cont') or match.group('cont_prefix'))
+
+                mention_only = bool(match.group('figure_mention') or match.group('table_mention'))
+
+                # 单数标签 + 行首 + 分隔符（或续表标记）才可能是图注
+                sep = match.group('sep') or ''
+                candidate = not mention_only and match.start() == 0 and (sep or continued)
+                if candidate:
+                    label_span = next((s for s in spans if s.get("text", "").strip()), {})
+                    if not sep.strip() and not continued:
+                        candidate = _whitespace_sep_ok(label_span, body_font, lines, stripped)
+
+                if candidate:
+                    styled = _is_styled(label_span, body_font, lines, stripped)
+
+                    # 图注文本：本行 + 同一文本块的后续行
+                    caption_text = join_lines(
+                        [stripped] + [_line_text(l) for l in lines[line_idx + 1:]]
+                    )
+                    if graphic_rects is None:
+                        graphic_rects = _graphic_rects(page)
+                    band = crop_band(item_type, bbox, page.rect.width, page.rect.height, continued)
+                    caption = {
+                        'page': page_num,
+                        'text': caption_text,
+                        'bbox': [round(v, 2) for v in bbox],
+                        'styled': styled,
+                        'emphasized': _is_emphasized(label_span, body_font),
+                        'graphics': _has_graphics(graphic_rects, band, bbox),
+                        'continued': continued,
+                    }
+                    entry = entry_for(item_type, number, sub)
+                    if styled:
+                        entry['captions'].append(caption)
+                    else:
+                        weak_captions.setdefault(figure_key(item_type, number, sub), []).append(caption)
+                    continue
+
+                # 其余出现都算正文引用（含编号列表/范围）；子图引用同时计入整图
+                for number, sub in label_numbers(match, stripped):
+                    referenced = [entry_for(item_type, number)]
+                    if sub:
+                        referenced.append(entry_for(item_type, number, sub))
+                    for entry in referenced:
+                        if page_num not in entry['mentions']:
+                            entry['mentions'].append(page_num)
+
+    # 没有任何带排版特征的图注时，才使用弱候选；否则弱候选只是正文引用
+    for key, captions in weak_captions.items():
+        entry = entries[key]
+        if not entry['captions']:
+            entry['captions'] = captions
+        else:
+            entry['mentions'] = sorted(set(entry['mentions']) | {c['page'] for c in captions})
+
+    return entries
+
+
+def _caption_rank(caption):
+    """越小越优先"""
+    return (not caption.get('graphics'), not caption.get('emphasized'), caption['page'])
+
+
+def select_render_targets(index):
+    """
+    全文范围去重：每个图表只选一个截图区域，续表/续图每页一个区域
+
+    选择规则：
+    - 主区域：非续表图注中排名最高的（带排版特征的图注优先，build_figure_index已过滤）
+      排名：截图区域内有图形/位图 > 标签加粗或字体与正文不同 > 页码靠前
+    - 续表：标注了continued的图注，或紧接主区域之后连续页上重复出现的同一图注
+    - 其他页上的重复"图注"（通常是正文行首的引用）丢弃
+
+    Returns:
+        按页码排序的列表：[{'key', 'type', 'number', 'sub', 'part', 'page', 'bbox', 'caption'}]
+        part为0表示主区域，1, 2...为续表各页
+    """
+    targets = []
+    for key, entry in index.items():
+        captions = entry['captions']
+        candidates = [c for c in captions if not c.get('continued')]
+        primary = min(candidates, default=None, key=_caption_rank)
+        if primary is None:
+            if not captions:
+                continue
+            # 只有续表图注（首页图注未识别），以最早的一页为主区域
+            primary = captions[0]
+
+        regions = [primary]
+        last_page = primary['page']
+        for caption in captions:
+            if caption['page'] <= last_page:
+                continue
+            repeated = caption['page'] == last_page + 1 and caption['text'] == primary['text']
+            if caption.get('continued') or repeated:
+                regions.append(caption)
+                last_page = caption['page']
+
+        for part, caption in enumerate(regions):
+            targets.append({
+                'key': key,
+                'type': entry['type'],
+                'number': entry['number'],
+                'sub': entry.get('sub', ''),
+                'part': part,
+                'page': caption['page'],
+                'bbox': caption['bbox'],
+                'caption': caption['text'],
+            })
+
+    targets.sort(key=lambda t: (t['page'], t['bbox'][1]))
+    return targets
+
+
+def save_figure_index(index, output_path):
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+
+
+def load_figure_index(index_path):
+    with open(index_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("用法: python figure_index.py <PDF文件> [输出JSON]")
+        print("示例: python figure_index.py ResNet_2015.pdf images/figure_index.json")
+        sys.exit(1)
+
+    import fitz  # PyMuPDF
+
+    pdf_path = Path(sys.argv[1])
+    output_path = sys.argv[2] if len(sys.argv) > 2 else "figure_index.json"
+
+    doc = fitz.open(str(pdf_path))
+    index = build_figure_index(doc)
+    doc.close()
+
+    save_figure_index(index, output_path)
+
+    for key, entry in index.items():
+        pages = [c['page'] for c in entry['captions']]
+        caption_info = f"图注在第{pages[0]}页" if pages else "未找到图注"
+        print(f"  {key.capitalize()}: {caption_info}，正文引用 {entry['mentions']}")
+    print(f"\n📝 索引已保存: {output_path}")
+
+
+if __name__ == '__main__':
+    main()
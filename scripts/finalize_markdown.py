@@ -2,10 +2,12 @@
 """
 提取markdown的H1标题作为文件名，并删除文章中的H1标题
 """
-import re
+import json
 import os
 import sys
 
+from markdown_doc import MarkdownDocument
+
 
 def extract_h1_and_remove(markdown_path):
     """
@@ -18,37 +20,25 @@ def extract_h1_and_remove(markdown_path):
         h1_title: 提取的H1标题（不含#符号），如果没有H1则返回None
         new_content: 删除H1后的内容
     """
-    with open(markdown_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # 匹配H1标题（行首的 # 标题）
-    h1_pattern = r'^#\s+(.+)$'
-    lines = content.split('\n')
-
-    h1_title = None
-    new_lines = []
-    h1_found = False
-
-    for line in lines:
-        match = re.match(h1_pattern, line)
-        if match and not h1_found:
-            # 找到第一个H1标题
-            h1_title = match.group(1).strip()
-            h1_found = True
-            # 跳过这一行（删除H1）
-            continue
-        else:
-            new_lines.append(line)
-
-    # 删除开头的空行
-    while new_lines and new_lines[0].strip() == '':
-        new_lines.pop(0)
-
-    new_content = '\n'.join(new_lines)
+    doc = MarkdownDocument.load(markdown_path)
+
+    # 删除第一个H1行（代码块内的"# "注释不算标题），并删除开头的空行
+    h1_title = doc.remove_first_h1()
+    new_content = doc.text
 
     return h1_title, new_content
 
 
+def finalized_filename(h1_title):
+    """H1标题 → 最终文件名（H1标题.md）"""
+    # 清理文件名中的非法字符
+    safe_filename = h1_title
+    # 移除Windows/Mac非法字符: / \ : * ? " < > |
+    for char in ['/', '\\', ':', '*', '?', '"', '<', '>', '|']:
+        safe_filename = safe_filename.replace(char, '')
+    return f"{safe_filename}.md"
+
+
 def save_with_h1_title(markdown_path, output_dir="."):
     """
     使用H1标题作为文件名保存markdown文件
@@ -67,23 +57,36 @@ def save_with_h1_title(markdown_path, output_dir="."):
     if not h1_title:
         return False, None, "未找到H1标题"
 
-    # 生成新文件名：H1标题.md
-    # 清理文件名中的非法字符
-    safe_filename = h1_title
-    # 移除Windows/Mac非法字符: / \ : * ? " < > |
-    for char in ['/', '\\', ':', '*', '?', '"', '<', '>', '|']:
-        safe_filename = safe_filename.replace(char, '')
-
-    output_filename = f"{safe_filename}.md"
-    output_path = os.path.join(output_dir, output_filename)
+    output_path = os.path.join(output_dir, finalized_filename(h1_title))
 
     # 保存文件
     with open(output_path, 'w', encoding='utf-8') as f:
         f.write(new_content)
 
+    record_finalized_path(markdown_path, output_path)
+
     return True, output_path, h1_title
 
 
+def record_finalized_path(markdown_path, output_path):
+    """
+    在同目录的metadata.json中记录最终文件路径，供library_status.py判断是否已完成
+
+    没有metadata.json（非papers/目录下的文章）时什么都不做
+    """
+    metadata_path = os.path.join(os.path.dirname(os.path.abspath(markdown_path)), "metadata.json")
+    if not os.path.exists(metadata_path):
+        return
+
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+
+    metadata["finalized_path"] = os.path.abspath(output_path)
+
+    with open(metadata_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+
+
 def main():
     """命令行工具"""
     if len(sys.argv) < 2:
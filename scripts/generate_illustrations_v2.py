@@ -13,7 +13,6 @@
 - 支持单独重新生成某张图
 """
 import json
-import re
 import sys
 from pathlib import Path
 
@@ -23,28 +22,17 @@ sys.path.insert(0, shared_lib_path)
 
 from image_api import ImageGenerator
 
+from image_store import release_path
+from markdown_doc import MarkdownDocument
 
-def parse_h2_sections(markdown_path):
-    """解析markdown中的所有H2标题"""
-    with open(markdown_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-
-    sections = []
-    current_h2 = None
-    current_line_num = 0
 
-    for i, line in enumerate(lines, 1):
-        h2_match = re.match(r'^##\s+(.+)$', line.strip())
-        if h2_match:
-            if current_h2:
-                sections.append((current_h2, current_line_num))
-            current_h2 = h2_match.group(1)
-            current_line_num = i
+# 配置模板中visual_description的占位内容
+PLACEHOLDER_DESCRIPTION = "待Claude分析填写..."
 
-    if current_h2:
-        sections.append((current_h2, current_line_num))
 
-    return sections
+def parse_h2_sections(markdown_path):
+    """解析markdown中的所有H2标题（跳过代码块），返回 [(标题, 行号)]"""
+    return MarkdownDocument.load(markdown_path).h2_sections()
 
 
 def create_visual_config_template(markdown_path, output_path="visual_config.json"):
@@ -70,7 +58,7 @@ def create_visual_config_template(markdown_path, output_path="visual_config.json
         "sections": [
             {
                 "h2_title": title,
-                "visual_description": "待Claude分析填写..."
+                "visual_description": PLACEHOLDER_DESCRIPTION
             }
             for title, _ in sections
         ]
@@ -85,29 +73,54 @@ def create_visual_config_template(markdown_path, output_path="visual_config.json
     return str(output_path)
 
 
-def insert_image_into_markdown(markdown_path, h2_title, image_path):
-    """在H2标题后插入图片引用"""
-    with open(markdown_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
+def insert_image_into_markdown(markdown_path, h2_title, image_path, doc=None):
+    """
+    在H2标题后插入图片引用
+
+    Args:
+        markdown_path: markdown文件路径
+        h2_title: H2标题
+        image_path: 图片相对路径
+        doc: 已解析的MarkdownDocument（批量插入时复用，避免重复解析）
+    """
+    if doc is None:
+        doc = MarkdownDocument.load(markdown_path)
+
+    result = doc.insert_image_after_heading(h2_title, image_path)
+    if result == 'exists':
+        print(f"   ⚠️  图片已存在，跳过插入")
+    elif result == 'missing':
+        print(f"   ⚠️  未找到H2标题: {h2_title}")
+    else:
+        # 写回文件
+        doc.save(markdown_path)
+
 
-    # 找到H2标题
-    for i, line in enumerate(lines):
-        if re.match(rf'^##\s+{re.escape(h2_title)}\s*$', line.strip()):
-            # 检查下一行是否已有图片
-            if i + 1 < len(lines) and lines[i + 1].strip().startswith('!['):
-                print(f"   ⚠️  图片已存在，跳过插入")
-                return
+def is_section_ready(section):
+    """section是否已填写visual_description"""
+    visual_desc = section.get('visual_description', '')
+    return visual_desc != PLACEHOLDER_DESCRIPTION and bool(visual_desc.strip())
 
-            # 插入图片
-            image_md = f"\n![{h2_title}]({image_path})\n\n"
-            lines.insert(i + 1, image_md)
 
-            # 写回文件
-            with open(markdown_path, 'w', encoding='utf-8') as f:
-                f.writelines(lines)
-            return
+def generate_section_image(generator, section, image_output_path):
+    """
+    为单个章节生成配图并保存
+
+    Returns:
+        实际使用的API名称
+    """
+    # 生成图片（16:9横幅 + 底部标题）
+    image_url, used_provider = generator.generate_newyorker_style(
+        visual_strategy=section['visual_description'],
+        caption=section.get('caption', ''),  # 传递底部标题
+        aspect_ratio='16:9',  # 16:9横幅，更适合文章配图
+        max_retries=3
+    )
 
-    print(f"   ⚠️  未找到H2标题: {h2_title}")
+    # 保存图片（如果原图是共享存储的链接，先断开，避免改写其他论文的图片）
+    release_path(image_output_path)
+    generator.save_image(image_url, str(image_output_path))
+    return used_provider
 
 
 def generate_from_config(
@@ -148,6 +161,7 @@ def generate_from_config(
 
     # 3. 初始化图片生成器
     generator = ImageGenerator(provider=provider)
+    doc = MarkdownDocument.load(markdown_path)
 
     # 4. 批量生成
     success_count = 0
@@ -162,7 +176,7 @@ def generate_from_config(
             print(f"   📝 底部标题: {caption}")
 
         # 检查是否需要分析
-        if visual_desc == "待Claude分析填写..." or not visual_desc.strip():
+        if not is_section_ready(section):
             print(f"   ⚠️  跳过：未填写visual_description")
             continue
 
@@ -174,26 +188,17 @@ def generate_from_config(
         # 跳过已存在
         if skip_existing and image_output_path.exists():
             print(f"   ⏭️  图片已存在，跳过")
-            insert_image_into_markdown(markdown_path, h2_title, image_rel_path)
+            insert_image_into_markdown(markdown_path, h2_title, image_rel_path, doc)
             success_count += 1
             continue
 
         try:
-            # 生成图片（16:9横幅 + 底部标题）
             print(f"   🎨 视觉描述: {visual_desc[:60]}...")
-            image_url, used_provider = generator.generate_newyorker_style(
-                visual_strategy=visual_desc,
-                caption=caption,  # 传递底部标题
-                aspect_ratio='16:9',  # 16:9横幅，更适合文章配图
-                max_retries=3
-            )
-
-            # 保存图片
-            generator.save_image(image_url, str(image_output_path))
+            used_provider = generate_section_image(generator, section, image_output_path)
             print(f"   ✅ 图片已保存: {image_filename} (使用 {used_provider})")
 
             # 插入到markdown
-            insert_image_into_markdown(markdown_path, h2_title, image_rel_path)
+            insert_image_into_markdown(markdown_path, h2_title, image_rel_path, doc)
             print(f"   ✅ 已插入到markdown")
 
             success_count += 1
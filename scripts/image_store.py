@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+内容寻址的共享图片存储
+
+所有论文的图片按内容哈希存放在 papers/.store/<哈希前2位>/<sha256>，
+各论文 images/ 下的原路径改为指向存储的硬链接（跨文件系统时用相对符号链接）。
+同一张图（论文v1/v2、重复收录的论文）在磁盘上只存一份。
+
+注意：硬链接共享同一份数据，原地改写会影响所有引用它的论文。
+存储文件设为只读（硬链接共享权限，论文中的图片也是只读），
+本项目的脚本在写图片前都会先调用 release_path() 断开链接；
+手动修改图片时请先删除再写入。
+
+用法：
+  python image_store.py ingest [papers目录]     # 把已有图片移入存储并去重
+  python image_store.py gc [papers目录]         # 删除没有任何论文引用的存储文件
+  python image_store.py status [papers目录] [--verify]   # --verify 校验存储文件哈希
+"""
+import errno
+import hashlib
+import os
+import sys
+from pathlib import Path
+
+
+STORE_DIRNAME = ".store"
+
+# 只对这些类型去重；figure_list.md、figure_index.json等文本文件保持原样
+ASSET_SUFFIXES = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.svg', '.pdf'}
+
+# 存储文件的权限：只读，防止绕过release_path()的原地改写污染共享内容
+BLOB_MODE = 0o444
+
+
+def default_store_dir(papers_dir="papers"):
+    return Path(papers_dir) / STORE_DIRNAME
+
+
+def file_digest(path):
+    """流式计算sha256，大文件不占内存"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def blob_path(store_dir, digest):
+    """按哈希前2位分目录，避免单目录下文件过多"""
+    return Path(store_dir) / digest[:2] / digest
+
+
+def blob_inodes(store_dir):
+    """存储中所有文件的 (st_dev, st_ino)，批量判断硬链接时避免逐个计算哈希"""
+    inodes = set()
+    for blob in iter_blobs(store_dir):
+        st = blob.stat()
+        inodes.add((st.st_dev, st.st_ino))
+    return inodes
+
+
+def _is_store_link(path, store_dir, known_inodes=None):
+    """path是否已经指向存储中的文件"""
+    path = Path(path)
+    if path.is_symlink():
+        return Path(store_dir).resolve() in path.resolve().parents
+    st = path.stat()
+    if st.st_nlink < 2:
+        return False
+    if known_inodes is not None:
+        return (st.st_dev, st.st_ino) in known_inodes
+    # 硬链接：存储中同名哈希文件的inode相同
+    blob = blob_path(store_dir, file_digest(path))
+    try:
+        blob_st = blob.stat()
+    except OSError:
+        return False
+    return (blob_st.st_dev, blob_st.st_ino) == (st.st_dev, st.st_ino)
+
+
+def _link(blob, path):
+    """原子地把path替换为指向blob的链接：优先硬链接，失败时用相对符号链接"""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.link")
+    if tmp_path.exists() or tmp_path.is_symlink():
+        tmp_path.unlink()
+    try:
+        os.link(blob, tmp_path)
+    except OSError:
+        os.symlink(os.path.relpath(blob, path.parent), tmp_path)
+    os.replace(tmp_path, path)
+
+
+def store_file(path, store_dir, known_inodes=None):
+    """
+    把文件移入存储，原路径改为链接
+
+    Args:
+        path: 图片路径
+        store_dir: 存储目录
+        known_inodes: blob_inodes()的结果，批量处理时传入以跳过哈希计算
+
+    Returns:
+        'stored'：新内容，已移入存储
+        'deduped'：存储中已有相同内容，原文件已替换为链接
+        'linked'：原本就是存储链接，未改动
+    """
+    path = Path(path)
+    if _is_store_link(path, store_dir, known_inodes):
+        return 'linked'
+
+    digest = file_digest(path)
+    blob = blob_path(store_dir, digest)
+
+    if blob.exists():
+        _link(blob, path)
+        return 'deduped'
+
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(path, blob)
+    except FileExistsError:
+        # 并发写入（如batch_illustrations多线程）：另一方刚存入了相同内容
+        _link(blob, path)
+        return 'deduped'
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        return _copy_into_store(path, blob)
+    os.chmod(blob, BLOB_MODE)
+    return 'stored'
+
+
+def _copy_into_store(path, blob):
+    """
+    跨文件系统：复制一份进存储，原路径改为符号链接
+
+    先复制到存储内的临时文件，再用os.link原子地放到blob位置；
+    不直接写blob，避免覆盖并发存入、已被其他论文链接的存储文件
+    """
+    import shutil
+    import tempfile
+    fd, tmp_path = tempfile.mkstemp(dir=blob.parent, prefix=f".{blob.name}.", suffix=".tmp")
+    os.close(fd)
+    tmp_path = Path(tmp_path)
+    shutil.copy2(path, tmp_path)
+    os.chmod(tmp_path, BLOB_MODE)
+    try:
+        os.link(tmp_path, blob)
+        result = 'stored'
+    except FileExistsError:
+        result = 'deduped'
+    finally:
+        tmp_path.unlink()
+    _link(blob, path)
+    return result
+
+
+def release_path(path):
+    """
+    写文件前调用：如果path是存储链接，先删除，避免改写共享的存储文件
+
+    普通文件和不存在的路径不做处理
+    """
+    path = Path(path)
+    if path.is_symlink():
+        path.unlink()
+    elif path.exists() and path.stat().st_nlink > 1:
+        path.unlink()
+
+
+def iter_assets(papers_dir):
+    """papers/*/images/ 下所有图片文件（含illustrations子目录）"""
+    papers_dir = Path(papers_dir)
+    for paper in sorted(papers_dir.iterdir()):
+        if paper.name.startswith('.') or not paper.is_dir():
+            continue
+        images_dir = paper / "images"
+        if not images_dir.is_dir():
+            continue
+        for root, _, files in os.walk(images_dir):
+            for name in files:
+                if Path(name).suffix.lower() in ASSET_SUFFIXES and not name.startswith('.'):
+                    yield Path(root) / name
+
+
+def ingest(papers_dir="papers", store_dir=None):
+    """
+    把论文库中的已有图片移入存储并去重
+
+    Returns:
+        {'stored': n, 'deduped': n, 'linked': n, 'saved_bytes': n}
+    """
+    store_dir = Path(store_dir) if store_dir else default_store_dir(papers_dir)
+    stats = {'stored': 0, 'deduped': 0, 'linked': 0, 'saved_bytes': 0}
+    known_inodes = blob_inodes(store_dir)
+
+    for path in iter_assets(papers_dir):
+        size = path.stat().st_size
+        result = store_file(path, store_dir, known_inodes)
+        stats[result] += 1
+        if result == 'deduped':
+            stats['saved_bytes'] += size
+
+    return stats
+
+
+def iter_blobs(store_dir):
+    store_dir = Path(store_dir)
+    if not store_dir.is_dir():
+        return
+    for shard in store_dir.iterdir():
+        if shard.is_dir():
+            # 以.开头的是_copy_into_store正在写入的临时文件
+            yield from (blob for blob in shard.iterdir() if not blob.name.startswith('.'))
+
+
+def verify(store_dir):
+    """重新计算存储文件的哈希，返回内容与文件名不符的存储文件列表"""
+    return [blob for blob in iter_blobs(store_dir) if file_digest(blob) != blob.name]
+
+
+def gc(papers_dir="papers", store_dir=None, dry_run=False):
+    """
+    删除没有任何论文引用的存储文件
+
+    硬链接引用：链接数为1即只剩存储本身
+    符号链接引用：扫描论文库收集所有指向存储的符号链接
+
+    Returns:
+        (删除数量, 释放字节数)
+    """
+    store_dir = Path(store_dir) if store_dir else default_store_dir(papers_dir)
+
+    symlinked = set()
+    for path in iter_assets(papers_dir):
+        if path.is_symlink():
+            symlinked.add(path.resolve().name)
+
+    removed = 0
+    freed = 0
+    for blob in iter_blobs(store_dir):
+        st = blob.stat()
+        if st.st_nlink > 1 or blob.name in symlinked:
+            continue
+        removed += 1
+        freed += st.st_size
+        if not dry_run:
+            blob.unlink()
+
+    return removed, freed
+
+
+def _format_size(num_bytes):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if num_bytes < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
+def main():
+    """命令行入口"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='内容寻址的共享图片存储（去重 + 垃圾回收）',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例用法：
+
+  1. 把已有图片移入存储并去重：
+     python image_store.py ingest papers
+
+  2. 先看看能清理多少，再真正删除：
+     python image_store.py gc papers --dry-run
+     python image_store.py gc papers
+        """
+    )
+    parser.add_argument('command', choices=['ingest', 'gc', 'status'], help='子命令')
+    parser.add_argument('papers_dir', nargs='?', default='papers',
+                        help='论文库目录（默认: papers）')
+    parser.add_argument('--store', help='存储目录（默认: <papers目录>/.store）')
+    parser.add_argument('--dry-run', action='store_true', help='gc时只统计不删除')
+    parser.add_argument('--verify', action='store_true', help='status时校验存储文件哈希')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.papers_dir):
+        print(f"错误：目录不存在: {args.papers_dir}")
+        sys.exit(1)
+
+    store_dir = Path(args.store) if args.store else default_store_dir(args.papers_dir)
+
+    if args.command == 'ingest':
+        stats = ingest(args.papers_dir, store_dir)
+        print(f"✅ 新存入 {stats['stored']} 个，去重 {stats['deduped']} 个，已是链接 {stats['linked']} 个")
+        print(f"💾 节省空间: {_format_size(stats['saved_bytes'])}")
+    elif args.command == 'gc':
+        removed, freed = gc(args.papers_dir, store_dir, dry_run=args.dry_run)
+        action = "可删除" if args.dry_run else "已删除"
+        print(f"🧹 {action} {removed} 个未引用的存储文件，释放 {_format_size(freed)}")
+    else:
+        blobs = list(iter_blobs(store_dir))
+        total = sum(blob.stat().st_size for blob in blobs)
+        print(f"📦 存储: {store_dir}")
+        print(f"   {len(blobs)} 个文件，共 {_format_size(total)}")
+        if args.verify:
+            corrupted = verify(store_dir)
+            if corrupted:
+                print(f"❌ {len(corrupted)} 个存储文件内容与哈希不符（被原地改写过）:")
+                for blob in corrupted:
+                    print(f"   - {blob}")
+                sys.exit(1)
+            print("✅ 所有存储文件哈希一致")
+
+
+if __name__ == '__main__':
+    main()
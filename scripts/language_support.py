@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+多语言支持：图注词表 + 标题分词器注册表
+
+图注词表：
+- 每种语言登记 Figure/Table 的标签词、续表标记，以及只用于正文引用的复数/缩写形式
+- 所有语言合并编译为一个定位正则，每行文本只扫描一次，
+  增加语言不会增加扫描次数
+
+标题分词器：
+- 每种语言登记 (检测函数, 简化函数)，按登记顺序选第一个检测通过的
+- simplify_title() 用它生成适合做文件名的短标识
+
+内置中文、英文。扩展示例：
+    register_caption_language('ja', figure=['図'], table=['表'])
+"""
+import re
+from functools import lru_cache
+
+
+CJK_CLASS = r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]'
+CJK_PATTERN = re.compile(CJK_CLASS)
+# CJK标点（U+3000–303F）与全角符号（U+FF00–FFEF）自带间距，拼接时前后不加空格
+FULLWIDTH_PATTERN = re.compile(r'[\u3000-\u303f\uff00-\uffef]')
+
+# 语言 -> {'figure': [...], 'table': [...], 'figure_mentions': [...], 'table_mentions': [...],
+#         'continued': [...], 'continued_prefix': [...], 'allowed_before': '...'}
+CAPTION_LANGUAGES = {}
+
+# [(语言, 检测函数, 简化函数)]，按顺序匹配
+TITLE_TOKENIZERS = []
+
+
+# ---------- 图注词表 ----------
+
+def register_caption_language(name, figure, table, figure_mentions=(), table_mentions=(),
+                              continued=(), continued_prefix=(), allowed_before=''):
+    """
+    登记一种语言的图注词表
+
+    Args:
+        name: 语言名（如 'zh'），重复登记会覆盖
+        figure: 图的标签词（如 ['图']）
+        table: 表的标签词（如 ['表']）
+        figure_mentions / table_mentions: 只出现在正文引用中的形式（如 'Figures'、'Figs.'），
+                                          不作为图注定位
+        continued: 编号之后的续表标记（如 'continued' → "Table 2 (continued)"）
+        continued_prefix: 标签之前的续表标记（如 '续' → "续表 2"）
+        allowed_before: 可以紧挨在CJK标签前的汉字（如 '如见' → "如图3"）；
+                        其他汉字后的标签视为词的一部分（"发表3篇"、"代表2个"）
+    """
+    CAPTION_LANGUAGES[name] = {
+        'figure': list(figure),
+        'table': list(table),
+        'figure_mentions': list(figure_mentions),
+        'table_mentions': list(table_mentions),
+        'continued': list(continued),
+        'continued_prefix': list(continued_prefix),
+        'allowed_before': allowed_before,
+    }
+    caption_locator.cache_clear()
+
+
+def _cjk_boundary():
+    """CJK词的左边界：前面不是汉字，或是 allowed_before 中的汉字"""
+    allowed = ''.join(sorted({c for vocab in CAPTION_LANGUAGES.values() for c in vocab['allowed_before']}))
+    if not allowed:
+        return r'(?<!' + CJK_CLASS + ')'
+    return r'(?:(?<!' + CJK_CLASS + r')|(?<=[' + re.escape(allowed) + r']))'
+
+
+def _alternation(words):
+    """词表 → 正则分支；拉丁字母开头的词加单词边界，CJK词加左边界（见_cjk_boundary）"""
+    parts = []
+    for word in sorted(set(words), key=len, reverse=True):
+        escaped = re.escape(word)
+        if word[:1].isascii() and word[:1].isalpha():
+            escaped = r'\b' + escaped
+        elif CJK_PATTERN.match(word[:1]):
+            escaped = _cjk_boundary() + escaped
+        parts.append(escaped)
+    return '|'.join(parts) or r'(?!)'
+
+
+def _collect(key):
+    return [word for vocab in CAPTION_LANGUAGES.values() for word in vocab[key]]
+
+
+@lru_cache(maxsize=1)
+def caption_locator():
+    """
+    所有语言合并后的图表标签定位正则
+
+    命名分组：
+        cont_prefix: 标签前的续表标记
+        figure / table: 标签词（哪个分组匹配即为类型）
+        figure_mention / table_mention: 只用于正文引用的标签词（复数、缩写）
+        num: 编号（3、3-1、3.1）
+        sub1 / sub2: 子图标签（3(b) / 3a）
+        sep: 图注分隔符（: ： . ．，或中文图注编号后直接跟空格+汉字；
+             只有空格时figure_index还要求字体与正文不同或独立成块）
+        cont: 编号后的续表标记；须加括号（"Table 2 (continued)"）或独占行尾
+              （"Table 2: Continued."），"Table 1: Continued pretraining" 不算
+    """
+    pattern = (
+        r'(?P<cont_prefix>' + _alternation(_collect('continued_prefix')) + r')?'
+        r'(?:(?P<figure>' + _alternation(_collect('figure')) + r')'
+        r'|(?P<table>' + _alternation(_collect('table')) + r')'
+        r'|(?P<figure_mention>' + _alternation(_collect('figure_mentions')) + r')'
+        r'|(?P<table_mention>' + _alternation(_collect('table_mentions')) + r'))'
+        r'\s*(?P<num>\d+(?:[-.．]\d+)*)'
+        r'(?:\((?P<sub1>[a-z])\)|(?P<sub2>[a-z])\b)?'
+        r'(?P<sep>\s*[:：.．]|\s+(?=[\u4e00-\u9fff]))?'
+        r'(?P<cont>\s*[(（]\s*(?:' + _alternation(_collect('continued')) + r')\s*[)）]'
+        r'|\s*[-–—]?\s*(?:' + _alternation(_collect('continued')) + r')\s*[.．]?\s*$)?'
+    )
+    return re.compile(pattern, re.IGNORECASE)
+
+
+# 编号列表中的分隔词："Figures 3, 4 and 6"、"图3、4"；范围："Figs. 3–5"、"图3~5"
+_LIST_SEPARATORS = [',', '，', '、', '&', 'and', '和', '与', '及']
+_RANGE_SEPARATORS = ['–', '—', '~', '～', 'to', '至']
+_LIST_TAIL = re.compile(
+    r'\s*(?:(?P<range>' + '|'.join(map(re.escape, _RANGE_SEPARATORS)) + r')'
+    r'|(?P<list>' + '|'.join(map(re.escape, _LIST_SEPARATORS)) + r'))'
+    r'\s*(?P<num>\d+(?:[.．]\d+)*)(?P<sub>[a-z])?(?![a-z0-9])',
+    re.IGNORECASE,
+)
+# 范围的最大跨度；"Figure 1 to 2019" 之类不是范围
+_MAX_RANGE = 50
+
+
+def _expand_range(start, end):
+    """start之后到end的编号；不像范围时返回None"""
+    if not (start.isdigit() and end.isdigit()):
+        return [end]
+    if 0 < int(end) - int(start) <= _MAX_RANGE:
+        return [str(n) for n in range(int(start) + 1, int(end) + 1)]
+    return None
+
+
+def label_numbers(match, text):
+    """
+    一次标签匹配引用的所有 (编号, 子图标签)，含后面的编号列表和范围
+
+    "Figures 3 and 4" → [('3', ''), ('4', '')]
+    "Figs. 3–5"       → [('3', ''), ('4', ''), ('5', '')]
+    "Figure 3a and 3b" → [('3', 'a'), ('3', 'b')]
+    复数/缩写形式中的 "3-5" 按范围处理；单数形式中的 "3-1" 是编号（如中文"图3-1"）。
+    单数形式后的逗号不当作列表（"Table 2, 3 models"）
+    """
+    sub = (match.group('sub1') or match.group('sub2') or '').lower()
+    number = match.group('num')
+    plural = bool(match.group('figure_mention') or match.group('table_mention'))
+
+    numbers = [(number, sub)]
+    if plural and '-' in number:
+        start, _, end = number.partition('-')
+        expanded = _expand_range(start, end) if start.isdigit() else None
+        if expanded:
+            numbers = [(start, '')] + [(n, '') for n in expanded]
+
+    pos = match.end()
+    while True:
+        tail = _LIST_TAIL.match(text, pos)
+        if not tail or (not plural and tail.group('list') in (',', '，')):
+            break
+        if tail.group('range') and not tail.group('sub'):
+            expanded = _expand_range(numbers[-1][0], tail.group('num'))
+            if expanded is None:
+                break
+            numbers += [(n, '') for n in expanded]
+        else:
+            numbers.append((tail.group('num'), (tail.group('sub') or '').lower()))
+        pos = tail.end()
+    return numbers
+
+
+def join_lines(lines):
+    """拼接多行文本：中文行之间、全角标点前后不加空格，其他加空格"""
+    result = ''
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if result and not (CJK_PATTERN.match(result[-1]) and CJK_PATTERN.match(line[0])
+                           or FULLWIDTH_PATTERN.match(result[-1])
+                           or FULLWIDTH_PATTERN.match(line[0])):
+            result += ' '
+        result += line
+    return result
+
+
+register_caption_language(
+    'en',
+    figure=['Figure', 'Fig.'],
+    table=['Table'],
+    figure_mentions=['Figures', 'Figs.', 'Figs', 'Fig'],
+    table_mentions=['Tables', 'Tabs.', 'Tab.'],
+    continued=['continued', 'cont.', "cont'd", 'continued from previous page',
+               'continued from the previous page'],
+)
+register_caption_language(
+    'zh',
+    figure=['图'],
+    table=['表'],
+    continued=['续'],
+    continued_prefix=['续'],
+    # "如图3""见表2""和图4""续表2"；"发表3篇""代表2个""列表1中"不算
+    allowed_before='如见续和与及或在由从据按依照于同比看参',
+)
+
+
+# ---------- 标题分词器 ----------
+
+def register_title_tokenizer(name, detect, simplify, first=False):
+    """
+    登记一种语言的标题简化方法
+
+    Args:
+        name: 语言名
+        detect: detect(title) -> bool，是否由该分词器处理
+        simplify: simplify(title, max_length) -> str
+        first: 插到最前面（优先于已登记的分词器）
+    """
+    entry = (name, detect, simplify)
+    if first:
+        TITLE_TOKENIZERS.insert(0, entry)
+    else:
+        TITLE_TOKENIZERS.append(entry)
+
+
+def find_title_tokenizer(title):
+    """返回第一个检测通过的 (语言, 简化函数)，都不通过时使用英文规则"""
+    for name, detect, simplify in TITLE_TOKENIZERS:
+        if detect(title):
+            return name, simplify
+    return 'en', _simplify_english_title
+
+
+def _is_chinese_title(title):
+    chars = [c for c in title if not c.isspace()]
+    if not chars:
+        return False
+    return sum(1 for c in chars if CJK_PATTERN.match(c)) / len(chars) > 0.3
+
+
+# 中文标题常见的前后缀，对区分论文没有帮助
+ZH_TITLE_PREFIXES = ('基于', '面向', '关于', '一种', '浅谈', '论')
+ZH_TITLE_SUFFIXES = ('的研究与实现', '的设计与实现', '研究与实现', '设计与实现',
+                     '的研究', '研究', '初探', '探讨', '探究', '分析')
+
+
+def _simplify_chinese_title(title, max_length=30):
+    """
+    中文标题简化
+
+    1. 有英文缩写（如"基于BERT的文本分类"）直接用缩写
+    2. 去掉"基于""研究"等通用前后缀
+    3. 安装了jieba（可选依赖）时取前3个词；
+       否则在"的""与"处切分，取前几段，不在词中间截断；
+       不足2字的段连同分隔词并入相邻段（"新的算法"不拆成"新_算法"）
+    """
+    acronyms = re.findall(r'(?<![A-Za-z0-9])[A-Z][A-Z0-9]+(?![A-Za-z0-9])', title)
+    if acronyms:
+        return acronyms[0]
+
+    core = re.sub(r'[^\w]', '', title.split('：')[0].split(':')[0])
+    for prefix in ZH_TITLE_PREFIXES:
+        if core.startswith(prefix) and len(core) > len(prefix):
+            core = core[len(prefix):]
+            break
+    for suffix in ZH_TITLE_SUFFIXES:
+        if core.endswith(suffix) and len(core) > len(suffix):
+            core = core[:-len(suffix)]
+            break
+
+    try:
+        import jieba
+    except ImportError:
+        jieba = None
+
+    if jieba:
+        words = [w for w in jieba.cut(core) if len(w) >= 2]
+        simplified = '_'.join(words[:3]) if words else core
+    else:
+        # "基于深度学习的图像分类研究" → 深度学习_图像分类；"参与"中的"与"不切
+        tokens = re.split(r'(的|(?<!参)与)', core)
+        parts = []
+        for sep, part in zip([''] + tokens[1::2], tokens[0::2]):
+            if not part:
+                continue
+            if parts and (len(parts[-1]) < 2 or len(part) < 2):
+                parts[-1] += sep + part
+            else:
+                parts.append(part)
+        parts = parts or [core]
+        simplified = parts[0]
+        for part in parts[1:3]:
+            if len(simplified) + 1 + len(part) > max_length:
+                break
+            simplified += '_' + part
+
+    return simplified[:max_length]
+
+
+def _simplify_english_title(title, max_length=30):
+    """
+    英文标题简化
+
+    1. 提取首字母缩写（如 BERT, GPT, T5）
+    2. 提取关键词（Transfer Learning, Attention）
+    3. 退回到前几个单词
+    """
+    # 常见缩写模式
+    acronyms = re.findall(r'\b[A-Z][A-Z0-9]+\b', title)
+    if acronyms:
+        # 使用第一个缩写
+        return acronyms[0]
+
+    # 提取关键词（大写开头的词）
+    keywords = re.findall(r'\b[A-Z][a-z]+\b', title)
+    if len(keywords) >= 2:
+        # 组合前2-3个关键词
+        combined = '_'.join(keywords[:3])
+        if len(combined) <= max_length:
+            return combined
+
+    # 如果没有合适的关键词，使用前N个单词
+    words = title.split()[:3]
+    simplified = '_'.join(w for w in words if len(w) > 3)
+
+    # 清理特殊字符
+    simplified = re.sub(r'[^\w\-]', '_', simplified)
+    simplified = re.sub(r'_+', '_', simplified)
+
+    return simplified[:max_length]
+
+
+register_title_tokenizer('zh', _is_chinese_title, _simplify_chinese_title)
+register_title_tokenizer('en', lambda title: not _is_chinese_title(title), _simplify_english_title)
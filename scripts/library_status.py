@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+扫描整个papers/论文库，汇总每篇论文各阶段的完成情况
+
+状态持久化到 papers/.library_state/（按目录名分成64个分片）：
+- 每篇论文记录 [阶段位掩码, 关键路径mtime的指纹, 最终文件路径]
+- 再次扫描时只stat关键路径，指纹未变的论文直接复用上次结果
+- 有变化时只重写变化论文所在的分片
+
+用法：
+  python library_status.py status [papers目录]
+  python library_status.py todo [papers目录] [--stage figures]
+"""
+import json
+import os
+import sys
+import time
+import zlib
+from collections import namedtuple
+
+from finalize_markdown import finalized_filename
+from markdown_doc import MarkdownDocument
+
+
+STATE_DIRNAME = ".library_state"
+STATE_VERSION = 3
+STATE_SHARDS = 64
+
+# 阶段顺序即工作流顺序
+STAGES = ["pdf", "text", "article", "figures", "illustrations", "finalized"]
+
+STAGE_LABELS = {
+    "pdf": "PDF",
+    "text": "文本提取",
+    "article": "解读文章",
+    "figures": "论文图表",
+    "illustrations": "纽约客配图",
+    "finalized": "最终文件",
+}
+
+STAGE_BITS = {stage: 1 << i for i, stage in enumerate(STAGES)}
+# 不是阶段：images/illustrations目录是否存在，决定是否需要stat它
+_ILLUSTRATIONS_DIR_BIT = 1 << len(STAGES)
+
+# 状态文件中每篇论文一个列表，字段顺序即此处顺序
+PaperRecord = namedtuple("PaperRecord", "stages fingerprint finalized_path")
+
+
+def has_stage(record, stage):
+    return bool(record.stages & STAGE_BITS[stage])
+
+
+def _mtime(path):
+    """返回mtime_ns，不存在返回0"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _fingerprint(paper_path, stages, finalized_path=None):
+    """
+    决定论文是否需要重新检查的关键路径mtime，合并为一个整数
+
+    目录mtime在增删文件时变化，足以反映各阶段产物的出现/消失。
+    images/illustrations只在目录已存在且配图尚未完成时才stat：
+    目录的创建/删除会改变images/的mtime，配图完成后不再关心其中的变化
+    """
+    parts = (
+        _mtime(paper_path),
+        _mtime(paper_path + "/metadata.json"),
+        _mtime(paper_path + "/images"),
+        _mtime(paper_path + "/images/illustrations")
+        if stages & _ILLUSTRATIONS_DIR_BIT and not stages & STAGE_BITS["illustrations"] else 0,
+        _mtime(finalized_path) if finalized_path else 0,
+    )
+    # 只含整数，hash不受PYTHONHASHSEED影响（None的hash在3.12之前每次运行都不同）；
+    # Python版本变化时最多全部重新检查一次
+    return hash(parts)
+
+
+def _listdir(path):
+    try:
+        return os.listdir(path)
+    except OSError:
+        return None
+
+
+def _guess_finalized_path(paper_path, names):
+    """
+    metadata.json未记录最终文件时（记录功能之前定稿的论文），
+    按步骤6的约定在项目根目录（papers/的上一级）找 {H1标题}.md
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(paper_path)))
+    for name in names:
+        if not name.endswith('_解读.md'):
+            continue
+        try:
+            h1_title = MarkdownDocument.load(os.path.join(paper_path, name)).h1_title()
+        except (OSError, ValueError):
+            continue
+        if h1_title:
+            candidate = os.path.join(root, finalized_filename(h1_title))
+            if os.path.exists(candidate):
+                return candidate
+    return None
+
+
+def _scan_paper(paper_path):
+    """完整检查一篇论文的各阶段状态"""
+    finalized_path = None
+    try:
+        with open(paper_path + "/metadata.json", 'r', encoding='utf-8') as f:
+            finalized_path = json.load(f).get("finalized_path")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    names = _listdir(paper_path) or []
+    if not finalized_path:
+        finalized_path = _guess_finalized_path(paper_path, names)
+    image_names = _listdir(paper_path + "/images") or []
+    illustration_names = _listdir(paper_path + "/images/illustrations")
+
+    done = {
+        "pdf": any(n.endswith('.pdf') for n in names),
+        "text": "extracted_text.txt" in names,
+        "article": any(n.endswith('_解读.md') for n in names),
+        "figures": "figure_list.md" in image_names
+                   or any(n.endswith('.png') for n in image_names),
+        "illustrations": any(n.endswith('.png') for n in illustration_names or []),
+        "finalized": bool(finalized_path) and os.path.exists(finalized_path),
+    }
+    stages = sum(STAGE_BITS[stage] for stage, ok in done.items() if ok)
+    if illustration_names is not None:
+        stages |= _ILLUSTRATIONS_DIR_BIT
+
+    return PaperRecord(stages, _fingerprint(paper_path, stages, finalized_path), finalized_path)
+
+
+def _shard_of(name):
+    return zlib.crc32(name.encode('utf-8')) % STATE_SHARDS
+
+
+def _shard_path(state_dir, shard):
+    return os.path.join(state_dir, f"{shard:02x}.json")
+
+
+def load_state(papers_dir):
+    """读取所有分片，返回 {目录名: PaperRecord}；版本不符或损坏的分片视为空"""
+    state_dir = os.path.join(papers_dir, STATE_DIRNAME)
+    papers = {}
+    for shard in range(STATE_SHARDS):
+        try:
+            with open(_shard_path(state_dir, shard), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if data.get("version") != STATE_VERSION:
+            continue
+        for name, fields in data["papers"].items():
+            papers[name] = PaperRecord(*fields)
+    return papers
+
+
+def save_state(papers_dir, papers, shards):
+    """只重写指定的分片；每个分片原子写入，避免中断时留下半个文件"""
+    state_dir = os.path.join(papers_dir, STATE_DIRNAME)
+    os.makedirs(state_dir, exist_ok=True)
+
+    by_shard = {shard: {} for shard in shards}
+    for name, record in papers.items():
+        shard = _shard_of(name)
+        if shard in by_shard:
+            by_shard[shard][name] = record
+
+    for shard, records in by_shard.items():
+        path = _shard_path(state_dir, shard)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": STATE_VERSION, "papers": records},
+                      f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+
+def scan_library(papers_dir="papers", full=False):
+    """
+    增量扫描论文库
+
+    Args:
+        papers_dir: 论文库根目录
+        full: 忽略缓存，全部重新检查
+
+    Returns:
+        (papers, changed_count)
+        papers: {目录名: PaperRecord}
+    """
+    papers_dir = str(papers_dir)
+    previous_papers = {} if full else load_state(papers_dir)
+
+    papers = {}
+    changed = 0
+    dirty = set(range(STATE_SHARDS)) if full else set()
+    with os.scandir(papers_dir) as entries:
+        for entry in entries:
+            # 跳过隐藏目录（状态目录、共享存储等）
+            if entry.name.startswith('.') or not entry.is_dir():
+                continue
+
+            previous = previous_papers.get(entry.name)
+            if previous is not None and previous.fingerprint == _fingerprint(
+                    entry.path, previous.stages, previous.finalized_path):
+                papers[entry.name] = previous
+                continue
+
+            papers[entry.name] = _scan_paper(entry.path)
+            dirty.add(_shard_of(entry.name))
+            changed += 1
+
+    for name in previous_papers.keys() - papers.keys():
+        dirty.add(_shard_of(name))
+
+    if dirty:
+        save_state(papers_dir, papers, dirty)
+
+    return papers, changed
+
+
+def summarize(papers):
+    """统计每个阶段的完成数量，返回 {stage: (done, total)}"""
+    total = len(papers)
+    return {
+        stage: (sum(1 for p in papers.values() if p.stages & bit), total)
+        for stage, bit in STAGE_BITS.items()
+    }
+
+
+def outstanding(papers, stage=None):
+    """
+    列出未完成的工作
+
+    Returns:
+        {stage: [目录名, ...]}，只包含有未完成论文的阶段
+    """
+    stages = [stage] if stage else STAGES
+    todo = {s: [] for s in stages}
+    for name in sorted(papers):
+        record = papers[name]
+        for s in stages:
+            if not has_stage(record, s):
+                todo[s].append(name)
+    return {s: names for s, names in todo.items() if names}
+
+
+def main():
+    """命令行入口"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='论文库状态汇总（增量扫描）',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例用法：
+
+  1. 查看各阶段完成情况：
+     python library_status.py status
+
+  2. 列出所有缺少论文图表的论文：
+     python library_status.py todo --stage figures
+
+  3. 忽略缓存重新扫描：
+     python library_status.py status --full
+        """
+    )
+    parser.add_argument('command', choices=['status', 'todo'], help='子命令')
+    parser.add_argument('papers_dir', nargs='?', default='papers',
+                        help='论文库目录（默认: papers）')
+    parser.add_argument('--stage', choices=STAGES, help='只看某个阶段（todo）')
+    parser.add_argument('--full', action='store_true', help='忽略缓存，全部重新检查')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.papers_dir):
+        print(f"错误：目录不存在: {args.papers_dir}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    papers, changed = scan_library(args.papers_dir, full=args.full)
+    elapsed = time.perf_counter() - start
+
+    if args.command == 'status':
+        print(f"📚 论文库: {args.papers_dir}（{len(papers)} 篇）\n")
+        for stage, (done, total) in summarize(papers).items():
+            print(f"  {done:>6}/{total}  {STAGE_LABELS[stage]}")
+    else:
+        todo = outstanding(papers, args.stage)
+        if not todo:
+            print("✅ 没有未完成的工作")
+        for stage, names in todo.items():
+            print(f"\n❌ 缺少{STAGE_LABELS[stage]}（{len(names)} 篇）:")
+            for name in names:
+                print(f"   - {name}")
+
+    print(f"\n⏱️  扫描耗时 {elapsed * 1000:.0f}ms（重新检查 {changed} 篇）")
+
+
+if __name__ == "__main__":
+    main()
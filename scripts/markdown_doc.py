@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Markdown文档模型：一次解析，多个工具共享
+
+解析内容：
+- ATX标题（# ~ ######），自动跳过代码块（``` / ~~~）内的行
+- 代码块范围
+- 图片引用（![alt](path)）
+
+解析结果建立索引，"标题 → 行号"、"章节是否已有图片"等查询为O(1)，
+插入/删除行时只平移受影响的索引，不重新扫描全文。
+"""
+import re
+from pathlib import Path
+
+
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.+?)\s*$')
+FENCE_PATTERN = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+IMAGE_PATTERN = re.compile(r'!\[[^\]]*\]\([^)]*\)')
+
+
+class MarkdownDocument:
+    """
+    解析后的markdown文档
+
+    行号均为0起始的列表下标；对外返回"第几行"时请自行+1。
+    """
+
+    def __init__(self, text, path=None):
+        self.path = Path(path) if path else None
+        self.lines = text.split('\n')
+        self._parse()
+
+    @classmethod
+    def load(cls, markdown_path):
+        """从文件读取并解析"""
+        with open(markdown_path, 'r', encoding='utf-8') as f:
+            return cls(f.read(), path=markdown_path)
+
+    # ---------- 解析 ----------
+
+    def _parse(self):
+        """单次扫描：标题、代码块、图片引用"""
+        self.headings = []        # [(level, title, line_idx)]，按出现顺序
+        self.fences = []          # [(start_idx, end_idx)]，end为闭合行（未闭合则为最后一行）
+        self.image_lines = set()  # 含图片引用的行（代码块外）
+        self._title_index = {}    # (level, title) -> 首次出现的line_idx
+
+        fence_char = None
+        fence_len = 0
+        fence_start = None
+
+        for idx, line in enumerate(self.lines):
+            fence_match = FENCE_PATTERN.match(line)
+
+            if fence_char is not None:
+                # 代码块内：只关心闭合标记
+                marker = fence_match.group(1) if fence_match else ''
+                if marker and marker[0] == fence_char and len(marker) >= fence_len \
+                        and not line.strip()[len(marker):].strip():
+                    self.fences.append((fence_start, idx))
+                    fence_char = None
+                continue
+
+            if fence_match:
+                marker = fence_match.group(1)
+                fence_char = marker[0]
+                fence_len = len(marker)
+                fence_start = idx
+                continue
+
+            heading_match = HEADING_PATTERN.match(line.strip())
+            if heading_match:
+                level = len(heading_match.group(1))
+                title = heading_match.group(2).strip()
+                self.headings.append((level, title, idx))
+                self._title_index.setdefault((level, title), idx)
+                continue
+
+            if IMAGE_PATTERN.search(line):
+                self.image_lines.add(idx)
+
+        if fence_char is not None:
+            # 未闭合的代码块延续到文末
+            self.fences.append((fence_start, len(self.lines) - 1))
+
+    def _shift(self, start_idx, delta):
+        """行号 >= start_idx 的所有索引平移delta"""
+        def moved(idx):
+            return idx + delta if idx >= start_idx else idx
+
+        self.headings = [(level, title, moved(idx)) for level, title, idx in self.headings]
+        self.fences = [(moved(s), moved(e)) for s, e in self.fences]
+        self.image_lines = {moved(idx) for idx in self.image_lines}
+        self._title_index = {key: moved(idx) for key, idx in self._title_index.items()}
+
+    # ---------- 查询 ----------
+
+    @property
+    def text(self):
+        return '\n'.join(self.lines)
+
+    def h1_title(self):
+        """第一个H1标题（不含#），没有则返回None"""
+        for level, title, _ in self.headings:
+            if level == 1:
+                return title
+        return None
+
+    def h2_sections(self):
+        """所有H2标题，返回 [(标题, 行号)]，行号从1开始"""
+        return [(title, idx + 1) for level, title, idx in self.headings if level == 2]
+
+    def find_heading(self, title, level=2):
+        """标题所在行下标，找不到返回None"""
+        return self._title_index.get((level, title.strip()))
+
+    def section_has_image(self, title, level=2):
+        """标题后第一个非空行是否为图片引用"""
+        idx = self.find_heading(title, level)
+        if idx is None:
+            return False
+        next_idx = idx + 1
+        while next_idx < len(self.lines) and not self.lines[next_idx].strip():
+            next_idx += 1
+        return next_idx in self.image_lines
+
+    # ---------- 编辑 ----------
+
+    def insert_lines(self, idx, new_lines):
+        """在下标idx处插入若干行，并更新索引"""
+        self._shift(idx, len(new_lines))
+        self.lines[idx:idx] = new_lines
+        for offset, line in enumerate(new_lines):
+            if IMAGE_PATTERN.search(line):
+                self.image_lines.add(idx + offset)
+
+    def delete_line(self, idx):
+        """删除下标idx处的行，并更新索引"""
+        del self.lines[idx]
+        self.headings = [h for h in self.headings if h[2] != idx]
+        self.image_lines.discard(idx)
+        self._title_index = {k: v for k, v in self._title_index.items() if v != idx}
+        self._shift(idx + 1, -1)
+        # 同名标题可能还有后续出现，重建该条目
+        for level, title, line_idx in self.headings:
+            self._title_index.setdefault((level, title), line_idx)
+
+    def insert_image_after_heading(self, title, image_path, alt=None, level=2):
+        """
+        在标题后插入图片引用
+
+        返回: 'inserted' / 'exists' / 'missing'
+        """
+        idx = self.find_heading(title, level)
+        if idx is None:
+            return 'missing'
+        if self.section_has_image(title, level):
+            return 'exists'
+        self.insert_lines(idx + 1, ['', f"![{alt or title}]({image_path})", ''])
+        return 'inserted'
+
+    def remove_first_h1(self):
+        """删除第一个H1行及其后紧跟的文首空行，返回标题（没有则None）"""
+        for level, title, idx in self.headings:
+            if level == 1:
+                self.delete_line(idx)
+                # 删除开头的空行
+                while self.lines and self.lines[0].strip() == '':
+                    self.delete_line(0)
+                return title
+        return None
+
+    def save(self, markdown_path=None):
+        """写回文件（默认写回原路径）"""
+        target = markdown_path or self.path
+        with open(target, 'w', encoding='utf-8') as f:
+            f.write(self.text)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+扫描版PDF的OCR兜底（可选）
+
+- 只处理没有文本层的页面，有文本层的页面不受影响
+- 多进程按页并行
+- 按页面内容哈希缓存OCR结果，重复运行直接读缓存
+
+依赖本地Tesseract（PyMuPDF通过 get_textpage_ocr 调用），未安装时给出提示并跳过。
+
+用法：
+  python ocr_pages.py <PDF文件> [输出文本] [--language eng+chi_sim]
+"""
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+
+DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'paper-teller' / 'ocr'
+DEFAULT_LANGUAGE = 'eng'
+DEFAULT_DPI = 300
+
+
+def page_has_text(page):
+    """页面是否有可提取的文本层"""
+    return bool(page.get_text("text").strip())
+
+
+def page_hash(page, language=DEFAULT_LANGUAGE, dpi=DEFAULT_DPI):
+    """
+    页面内容哈希：内容流 + 页面引用的图片原始数据 + OCR参数
+
+    同一扫描页出现在不同PDF（如v1/v2）中时哈希相同，可共享缓存
+    """
+    doc = page.parent
+    h = hashlib.sha256()
+    h.update(f"{language}|{dpi}|{page.rotation}|{tuple(page.rect)}".encode())
+    h.update(page.read_contents())
+    for image in page.get_images(full=True):
+        h.update(doc.xref_stream_raw(image[0]) or b'')
+    return h.hexdigest()
+
+
+def _ocr_page(pdf_path, page_index, language, dpi):
+    """
+    在子进程中OCR单页
+
+    Returns:
+        (page_index, result, error)
+        result: {'text': 纯文本, 'dict': get_text("dict")格式的结构}
+    """
+    import fitz  # PyMuPDF
+
+    try:
+        doc = fitz.open(pdf_path)
+        page = doc[page_index]
+        flags = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+        textpage = page.get_textpage_ocr(flags=flags, language=language, dpi=dpi, full=True)
+        result = {
+            'text': page.get_text("text", textpage=textpage),
+            'dict': page.get_text("dict", textpage=textpage),
+        }
+        doc.close()
+        return page_index, result, None
+    except Exception as e:
+        return page_index, None, str(e)
+
+
+def ocr_missing_text(pdf_path, language=DEFAULT_LANGUAGE, dpi=DEFAULT_DPI,
+                     workers=None, cache_dir=DEFAULT_CACHE_DIR, pages=None):
+    """
+    对没有文本层的页面做OCR
+
+    Args:
+        pdf_path: PDF文件路径
+        language: Tesseract语言（如 'eng'、'eng+chi_sim'）
+        dpi: OCR渲染分辨率
+        workers: 并行进程数（默认CPU核数）
+        cache_dir: 缓存目录，None表示不缓存
+        pages: 只处理这些页码（从1开始），None表示全部
+
+    Returns:
+        {页码(从1开始): {'text': ..., 'dict': ...}}，只包含OCR过的页面
+    """
+    import fitz  # PyMuPDF
+
+    pdf_path = str(pdf_path)
+    cache_dir = Path(cache_dir) if cache_dir else None
+    if cache_dir:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+    results = {}
+    todo = {}  # page_index -> 缓存文件
+
+    doc = fitz.open(pdf_path)
+    for page in doc:
+        if pages is not None and page.number + 1 not in pages:
+            continue
+        if page_has_text(page):
+            continue
+        cache_path = cache_dir / f"{page_hash(page, language, dpi)}.json" if cache_dir else None
+        if cache_path and cache_path.exists():
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                results[page.number + 1] = json.load(f)
+        else:
+            todo[page.number] = cache_path
+    doc.close()
+
+    if not todo:
+        if results:
+            print(f"🔍 OCR: {len(results)} 页全部命中缓存")
+        return results
+
+    try:
+        fitz.get_tessdata()
+    except RuntimeError:
+        print(f"⚠️  {len(todo)} 页没有文本层，但未找到Tesseract，跳过OCR")
+        print("💡 安装: apt install tesseract-ocr / brew install tesseract")
+        return results
+
+    print(f"🔍 OCR: {len(todo)} 页没有文本层（缓存命中 {len(results)} 页）...")
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as executor:
+        futures = [
+            executor.submit(_ocr_page, pdf_path, page_index, language, dpi)
+            for page_index in sorted(todo)
+        ]
+        for future in futures:
+            page_index, result, error = future.result()
+            if error:
+                print(f"  ⚠️  第{page_index + 1}页OCR失败: {error}")
+                continue
+            results[page_index + 1] = result
+            cache_path = todo[page_index]
+            if cache_path:
+                with open(cache_path, 'w', encoding='utf-8') as f:
+                    json.dump(result, f, ensure_ascii=False)
+
+    return results
+
+
+def extract_text_with_ocr(pdf_path, **ocr_options):
+    """全文文本，没有文本层的页面使用OCR结果"""
+    import fitz  # PyMuPDF
+
+    ocr_results = ocr_missing_text(pdf_path, **ocr_options)
+
+    doc = fitz.open(str(pdf_path))
+    pages = []
+    for page in doc:
+        ocr = ocr_results.get(page.number + 1)
+        pages.append(ocr['text'] if ocr else page.get_text("text"))
+    doc.close()
+
+    return '\n'.join(pages)
+
+
+def main():
+    """命令行工具"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='提取PDF全文，扫描页自动OCR',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  python ocr_pages.py papers/Scan_1998/Scan_1998.pdf papers/Scan_1998/extracted_text.txt
+  python ocr_pages.py thesis.pdf extracted_text.txt --language chi_sim+eng
+        """
+    )
+    parser.add_argument('pdf', help='PDF文件')
+    parser.add_argument('output', nargs='?', default='extracted_text.txt',
+                        help='输出文本文件（默认: extracted_text.txt）')
+    parser.add_argument('--language', default=DEFAULT_LANGUAGE,
+                        help=f'Tesseract语言（默认: {DEFAULT_LANGUAGE}）')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI,
+                        help=f'OCR分辨率（默认: {DEFAULT_DPI}）')
+    parser.add_argument('--workers', type=int, default=None, help='并行进程数（默认: CPU核数）')
+    parser.add_argument('--no-cache', action='store_true', help='不读写OCR缓存')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.pdf):
+        print(f"错误：文件不存在: {args.pdf}")
+        sys.exit(1)
+
+    text = extract_text_with_ocr(
+        args.pdf,
+        language=args.language,
+        dpi=args.dpi,
+        workers=args.workers,
+        cache_dir=None if args.no_cache else DEFAULT_CACHE_DIR,
+    )
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+    print(f"✅ 文本已保存: {args.output}（{len(text)} 字符）")
+
+
+if __name__ == '__main__':
+    main()